@@ -1,7 +1,13 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
 import asyncio
+import bisect
+import collections
+import contextlib
+import hashlib
+import heapq
+import itertools
 import json
 import os
 from datetime import datetime, timedelta
@@ -9,6 +15,7 @@ import aiosqlite
 from typing import Optional
 import pytz
 import re
+import time
 import traceback
 
 # --- PODSTAWOWA KONFIGURACJA ---
@@ -17,7 +24,6 @@ intents.message_content = True
 intents.guilds = True
 intents.members = True
 bot = commands.Bot(command_prefix='!', intents=intents)
-LOG_CHANNEL_ID = None
 POLAND_TZ = pytz.timezone('Europe/Warsaw')
 DB_PATH = '/data/bot_database.db'
 
@@ -32,13 +38,15 @@ COLORS = {
 }
 
 # --- KONFIGURACJA FUNKCJI ---
-NOTIFICATION_CONFIG = {}
-REMINDER_CONFIG = {
-    "enabled": False,
-    "delay_days": 3
+# Domyślne ustawienia serwera - nadpisywane przez /setup_* i trzymane w tabeli guild_config
+DEFAULT_GUILD_CONFIG = {
+    "log_channel_id":      None,
+    "notifications":       {},
+    "reminders_enabled":   False,
+    "reminder_delay_days": 3,
+    "shop_channel_id":     None,
 }
 SHOP_CONFIG = {
-    "channel_id": None,
     "manual_reward_roles": ["Opiekun JB", "Zarząd", "Właściciel"]
 }
 SHOP_CATEGORIES = ["Specjalne role", "VIP", "Premium", "Fajki", "Oferty Dnia", "Inne"]
@@ -75,13 +83,14 @@ CREATIVE_RECRUITMENT_TYPES = [
 ALL_RECRUITMENT_TYPES = ADMIN_RECRUITMENT_TYPES + CREATIVE_RECRUITMENT_TYPES
 
 # --- MAPOWANIE TAGÓW (PUNKT 2 - automatyczne tagi) ---
+# Wartości to nazwy tagów forum - Discord przyjmuje najwyżej 20 znaków.
 TAG_MAPPING = {
     # Propozycje
     "Propozycja JailBreak":      "Propozycja JailBreak",
     "Propozycja Supermoce":      "Propozycja Supermoce",
-    "Propozycja Surf + RPG":     "Propozycja Surf + RPG",
+    "Propozycja Surf + RPG":     "Propozycja Surf+RPG",
     "Propozycja DeathRun":       "Propozycja DeathRun",
-    "Propozycja Projekt RPG":    "Propozycja Projekt RPG",
+    "Propozycja Projekt RPG":    "Propozycja Proj. RPG",
     "Propozycja Discord":        "Propozycja Discord",
     "Propozycja Inne":           "Propozycja Inne",
     # Błędy
@@ -105,15 +114,15 @@ TAG_MAPPING = {
     "Odwołanie Supermoce":       "Odwołanie Supermoce",
     "Odwołanie Surf + RPG":      "Odwołanie Surf + RPG",
     "Odwołanie DeathRun":        "Odwołanie DeathRun",
-    "Odwołanie Projekt RPG":     "Odwołanie Projekt RPG",
+    "Odwołanie Projekt RPG":     "Odwołanie Proj. RPG",
     "Odwołanie Discord":         "Odwołanie Discord",
     "Odwołanie Inne":            "Odwołanie Inne",
     # Podania Admin
     "Podanie Admin JB":          "Podanie Admin JB",
-    "Podanie Admin Supermoce":   "Podanie Admin Supermoce",
-    "Podanie Admin Surf + RPG":  "Podanie Admin Surf + RPG",
+    "Podanie Admin Supermoce":   "Podanie Admin SM",
+    "Podanie Admin Surf + RPG":  "Podanie Admin Surf",
     "Podanie Admin DR":          "Podanie Admin DR",
-    "Podanie Admin Projekt RPG": "Podanie Admin Projekt RPG",
+    "Podanie Admin Projekt RPG": "Podanie Admin PRPG",
     "Podanie Admin DC":          "Podanie Admin DC",
     # Podania Zaufany
     "Podanie Zaufany JB":        "Podanie Zaufany JB",
@@ -140,6 +149,24 @@ CREATIVE_RECRUITMENT_ADMIN_ROLES = ["Właściciel", "Zarząd"]
 ANNOUNCEMENT_ADMIN_ROLES = ["Właściciel", "Zarząd"]
 REDAKCJA_ROLES = ["Właściciel", "Zarząd", "Redaktor"]
 GENERAL_ADMIN_ROLES = ["Właściciel", "Zarząd", "Opiekun JB", "Opiekun Discord"]
+GAME_SERVER_ADMIN_ROLES = ["Opiekun JB", "Zarząd", "Właściciel"]
+DISCORD_ADMIN_ROLES = ["Opiekun Discord", "Zarząd", "Właściciel"]
+
+# Kto może zarządzać zgłoszeniem danego typu (ManagementSelect)
+POST_TYPE_ROLES = {
+    "Propozycja":                GENERAL_ADMIN_ROLES,
+    "Błąd":                      GENERAL_ADMIN_ROLES,
+    "Skarga":                    GENERAL_ADMIN_ROLES,
+    "Odwołanie":                 GENERAL_ADMIN_ROLES,
+    "Podanie Admin JB":          GAME_SERVER_ADMIN_ROLES,
+    "Podanie Zaufany JB":        GAME_SERVER_ADMIN_ROLES,
+    "Podanie Admin Supermoce":   GAME_SERVER_ADMIN_ROLES,
+    "Podanie Admin Surf + RPG":  GAME_SERVER_ADMIN_ROLES,
+    "Podanie Admin DR":          GAME_SERVER_ADMIN_ROLES,
+    "Podanie Admin Projekt RPG": GAME_SERVER_ADMIN_ROLES,
+    "Podanie Admin DC":          DISCORD_ADMIN_ROLES,
+    **{app_type: CREATIVE_RECRUITMENT_ADMIN_ROLES for app_type in CREATIVE_RECRUITMENT_TYPES},
+}
 
 # --- SZABLONY ODPOWIEDZI ---
 RESPONSE_TEMPLATES = {
@@ -170,179 +197,808 @@ RESPONSE_TEMPLATES = {
 # =========================================================
 # --- BAZA DANYCH ---
 # =========================================================
-async def init_database():
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS suggestions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL, username TEXT NOT NULL,
-                category TEXT NOT NULL, description TEXT NOT NULL,
-                reason TEXT NOT NULL, server TEXT DEFAULT 'Nieokreślony',
-                thread_id TEXT, status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS bug_reports (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL, category TEXT NOT NULL,
-                bug_type TEXT NOT NULL, description TEXT NOT NULL,
-                evidence TEXT, server TEXT DEFAULT 'Nieokreślony',
-                thread_id TEXT, status TEXT DEFAULT 'reported',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS complaints (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL, complaint_type TEXT NOT NULL,
-                target_user TEXT NOT NULL, data TEXT NOT NULL,
-                server TEXT DEFAULT 'Nieokreślony',
-                thread_id TEXT, status TEXT DEFAULT 'open',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS appeals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL, appeal_type TEXT NOT NULL,
-                data TEXT NOT NULL, server TEXT DEFAULT 'Nieokreślony',
-                thread_id TEXT, status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS applications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL, username TEXT NOT NULL,
-                application_type TEXT NOT NULL, data TEXT NOT NULL,
-                thread_id TEXT, status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS reputation_points (
-                user_id TEXT PRIMARY KEY, points INTEGER DEFAULT 0
-            )''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS polls (
-                message_id INTEGER PRIMARY KEY, question TEXT NOT NULL,
-                options TEXT NOT NULL, votes TEXT NOT NULL, author_id INTEGER NOT NULL
-            )''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS shop_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL, description TEXT,
-                cost INTEGER NOT NULL, category TEXT NOT NULL,
-                role_id INTEGER DEFAULT NULL, stock INTEGER DEFAULT NULL
-            )''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS shop_purchases (
-                user_id INTEGER NOT NULL, item_id INTEGER NOT NULL,
-                PRIMARY KEY (user_id, item_id)
-            )''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS recruitment_status (
-                position TEXT PRIMARY KEY, is_open INTEGER DEFAULT 1
-            )''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS events (
-                message_id INTEGER PRIMARY KEY,
-                author_id INTEGER NOT NULL, attendees TEXT NOT NULL
-            )''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS editorial_counters (
-                type TEXT PRIMARY KEY, count INTEGER DEFAULT 0
-            )''')
-
-        # --- PUNKT 1: Tabela cooldownów na podania ---
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS application_cooldowns (
-                user_id TEXT NOT NULL,
-                application_type TEXT NOT NULL,
-                rejected_at TIMESTAMP NOT NULL,
-                PRIMARY KEY (user_id, application_type)
-            )''')
-
-        # --- PUNKT 2: Tabela paneli rekrutacji do odświeżania ---
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS recruitment_panels (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id TEXT NOT NULL,
-                channel_id TEXT NOT NULL,
-                thread_id TEXT NOT NULL,
-                message_id TEXT NOT NULL,
-                panel_type TEXT NOT NULL
-            )''')
-
-        # Dodaj kolumny jeśli nie istnieją (migracja)
-        migrations = [
-            ("suggestions",  "reminder_sent INTEGER DEFAULT 0"),
-            ("bug_reports",  "reminder_sent INTEGER DEFAULT 0"),
-            ("complaints",   "reminder_sent INTEGER DEFAULT 0"),
-            ("appeals",      "reminder_sent INTEGER DEFAULT 0"),
-            ("applications", "reminder_sent INTEGER DEFAULT 0"),
-            ("suggestions",  "server TEXT DEFAULT 'Nieokreślony'"),
-            ("bug_reports",  "server TEXT DEFAULT 'Nieokreślony'"),
-            ("complaints",   "server TEXT DEFAULT 'Nieokreślony'"),
-            ("appeals",      "server TEXT DEFAULT 'Nieokreślony'"),
-        ]
-        for table, col_def in migrations:
+DB_READER_COUNT = 3
+DB_PRAGMAS = {
+    "busy_timeout": 5000,
+    "synchronous":  "NORMAL",
+    "cache_size":   -16000,      # ~16 MB na połączenie
+    "mmap_size":    67108864,    # 64 MB
+    "temp_store":   "MEMORY",
+}
+
+
+class Database:
+    """
+    Długo żyjące połączenia z bazą otwierane raz przy starcie bota.
+    Jeden writer (zapisy serializowane blokadą) + mała pula readerów (WAL).
+    """
+    def __init__(self, path: str, readers: int = DB_READER_COUNT):
+        self.path = path
+        self.reader_count = readers
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._readers: asyncio.Queue = asyncio.Queue()
+        self._all_readers = []
+
+    @property
+    def started(self) -> bool:
+        return self._writer is not None
+
+    async def _open(self, read_only: bool = False) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.path)
+        for name, value in DB_PRAGMAS.items():
+            await conn.execute(f"PRAGMA {name} = {value}")
+        if read_only:
+            await conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    async def start(self):
+        if self.started:
+            return
+        writer = await self._open()
+        async with writer.execute("PRAGMA journal_mode = WAL") as cursor:
+            await cursor.fetchone()
+        self._writer = writer
+        for _ in range(self.reader_count):
+            conn = await self._open(read_only=True)
+            self._all_readers.append(conn)
+            self._readers.put_nowait(conn)
+
+    async def close(self):
+        if not self.started:
+            return
+        async with self._write_lock:
+            await self._writer.close()
+            self._writer = None
+        for conn in self._all_readers:
+            await conn.close()
+        self._all_readers.clear()
+        self._readers = asyncio.Queue()
+
+    @contextlib.asynccontextmanager
+    async def write(self):
+        """Połączenie writera na czas jednej transakcji (commit przy wyjściu, rollback przy błędzie)."""
+        async with self._write_lock:
+            if not self.started:
+                raise RuntimeError("Baza danych jest zamknięta.")
             try:
-                await db.execute(f"ALTER TABLE {table} ADD COLUMN {col_def}")
-            except Exception:
-                pass
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            else:
+                await self._writer.commit()
+
+    @contextlib.asynccontextmanager
+    async def read(self):
+        """Połączenie z puli readerów (tylko odczyt)."""
+        if not self.started:
+            raise RuntimeError("Baza danych jest zamknięta.")
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+
+database = Database(DB_PATH)
+
+
+# --- MIGRACJE SCHEMATU ---
+# Każda migracja wykonuje się dokładnie raz, numer ostatniej zastosowanej
+# trzymany jest w PRAGMA user_version. Nowe zmiany schematu = nowa funkcja
+# dopisana na koniec listy MIGRATIONS (nigdy nie edytuj już wydanych).
+async def add_column_if_missing(db, table: str, column: str, col_def: str):
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        columns = {row[1] for row in await cursor.fetchall()}
+    if column not in columns:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_def}")
+
+
+async def migration_base_schema(db):
+    """Tabele bazowe (schemat sprzed wersjonowania) + dawne ALTER TABLE."""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS suggestions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL, username TEXT NOT NULL,
+            category TEXT NOT NULL, description TEXT NOT NULL,
+            reason TEXT NOT NULL, server TEXT DEFAULT 'Nieokreślony',
+            thread_id TEXT, status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS bug_reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL, category TEXT NOT NULL,
+            bug_type TEXT NOT NULL, description TEXT NOT NULL,
+            evidence TEXT, server TEXT DEFAULT 'Nieokreślony',
+            thread_id TEXT, status TEXT DEFAULT 'reported',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS complaints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL, complaint_type TEXT NOT NULL,
+            target_user TEXT NOT NULL, data TEXT NOT NULL,
+            server TEXT DEFAULT 'Nieokreślony',
+            thread_id TEXT, status TEXT DEFAULT 'open',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS appeals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL, appeal_type TEXT NOT NULL,
+            data TEXT NOT NULL, server TEXT DEFAULT 'Nieokreślony',
+            thread_id TEXT, status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS applications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL, username TEXT NOT NULL,
+            application_type TEXT NOT NULL, data TEXT NOT NULL,
+            thread_id TEXT, status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS reputation_points (
+            user_id TEXT PRIMARY KEY, points INTEGER DEFAULT 0
+        )''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS polls (
+            message_id INTEGER PRIMARY KEY, question TEXT NOT NULL,
+            options TEXT NOT NULL, votes TEXT NOT NULL, author_id INTEGER NOT NULL
+        )''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS shop_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL, description TEXT,
+            cost INTEGER NOT NULL, category TEXT NOT NULL,
+            role_id INTEGER DEFAULT NULL, stock INTEGER DEFAULT NULL
+        )''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS shop_purchases (
+            user_id INTEGER NOT NULL, item_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, item_id)
+        )''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS recruitment_status (
+            position TEXT PRIMARY KEY, is_open INTEGER DEFAULT 1
+        )''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            message_id INTEGER PRIMARY KEY,
+            author_id INTEGER NOT NULL, attendees TEXT NOT NULL
+        )''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS editorial_counters (
+            type TEXT PRIMARY KEY, count INTEGER DEFAULT 0
+        )''')
+
+    # --- PUNKT 1: Tabela cooldownów na podania ---
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS application_cooldowns (
+            user_id TEXT NOT NULL,
+            application_type TEXT NOT NULL,
+            rejected_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (user_id, application_type)
+        )''')
+
+    # --- PUNKT 2: Tabela paneli rekrutacji do odświeżania ---
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS recruitment_panels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            thread_id TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            panel_type TEXT NOT NULL
+        )''')
+
+    # Kolumny dodane później - starsze bazy mogą ich nie mieć
+    added_columns = [
+        ("suggestions",  "reminder_sent", "INTEGER DEFAULT 0"),
+        ("bug_reports",  "reminder_sent", "INTEGER DEFAULT 0"),
+        ("complaints",   "reminder_sent", "INTEGER DEFAULT 0"),
+        ("appeals",      "reminder_sent", "INTEGER DEFAULT 0"),
+        ("applications", "reminder_sent", "INTEGER DEFAULT 0"),
+        ("suggestions",  "server", "TEXT DEFAULT 'Nieokreślony'"),
+        ("bug_reports",  "server", "TEXT DEFAULT 'Nieokreślony'"),
+        ("complaints",   "server", "TEXT DEFAULT 'Nieokreślony'"),
+        ("appeals",      "server", "TEXT DEFAULT 'Nieokreślony'"),
+    ]
+    for table, column, col_def in added_columns:
+        await add_column_if_missing(db, table, column, col_def)
+
+
+async def migration_indexes(db):
+    """Indeksy pod najczęstsze zapytania (antyspam, przypomnienia, kartoteka, wątki)."""
+    type_columns = {
+        "suggestions":  "category",
+        "bug_reports":  "category",
+        "complaints":   "complaint_type",
+        "appeals":      "appeal_type",
+        "applications": "application_type",
+    }
+    for table, type_col in type_columns.items():
+        # /info, /moje_zgloszenia - pokrywający po user_id
+        await db.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_user "
+            f"ON {table} (user_id, {type_col}, status, thread_id)")
+        # Skan przypomnień - pokrywający (reminder_sent, created_at)
+        await db.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_reminder "
+            f"ON {table} (reminder_sent, created_at, status, thread_id, {type_col})")
+        await db.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_thread ON {table} (thread_id)")
+    # check_active_application
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_applications_active "
+        "ON applications (user_id, application_type, status)")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recruitment_panels_guild ON recruitment_panels (guild_id)")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_shop_items_category ON shop_items (category, cost)")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reputation_points_points ON reputation_points (points DESC)")
+
+
+async def migration_submissions(db):
+    """Jedna tabela submissions zamiast pięciu + jednorazowe przeniesienie starych wierszy."""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL, type TEXT NOT NULL,
+            server TEXT DEFAULT 'Nieokreślony',
+            status TEXT NOT NULL DEFAULT 'pending',
+            user_id TEXT NOT NULL, thread_id TEXT, guild_id TEXT,
+            reminder_sent INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            payload TEXT NOT NULL DEFAULT '{}'
+        )''')
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submissions_user "
+        "ON submissions (user_id, kind, type, status, thread_id)")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submissions_status ON submissions (status, kind)")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submissions_created ON submissions (created_at, kind)")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submissions_reminder "
+        "ON submissions (status, reminder_sent, created_at)")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submissions_thread ON submissions (thread_id)")
+
+    # Stare statusy 'reported' (błędy) i 'open' (skargi) znaczyły to samo co 'pending'
+    status_expr = "CASE WHEN status IN ('reported', 'open') THEN 'pending' ELSE status END"
+    data_expr   = "CASE WHEN json_valid(data) THEN json(data) ELSE data END"
+    legacy = [
+        ("suggestion",  "suggestions",  "category",         "server",
+         "json_object('username', username, 'description', description, 'reason', reason)"),
+        ("bug_report",  "bug_reports",  "category",         "server",
+         "json_object('bug_type', bug_type, 'description', description, 'evidence', evidence)"),
+        ("complaint",   "complaints",   "complaint_type",   "server",
+         f"json_object('target_user', target_user, 'data', {data_expr})"),
+        ("appeal",      "appeals",      "appeal_type",      "server",
+         f"json_object('data', {data_expr})"),
+        ("application", "applications", "application_type", "'Nieokreślony'",
+         f"json_object('username', username, 'data', {data_expr})"),
+    ]
+    for kind, table, type_col, server_expr, payload_expr in legacy:
+        await db.execute(
+            f"INSERT INTO submissions "
+            f"(kind, type, server, status, user_id, thread_id, reminder_sent, created_at, payload) "
+            f"SELECT '{kind}', {type_col}, {server_expr}, {status_expr}, user_id, thread_id, "
+            f"COALESCE(reminder_sent, 0), created_at, {payload_expr} FROM {table} ORDER BY id")
+
+
+async def migration_decision_ledger(db):
+    """Księga decyzji moderatorów (tylko dopisywanie)."""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS submission_decisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            thread_id TEXT NOT NULL, action TEXT NOT NULL,
+            moderator_id TEXT NOT NULL, reason TEXT,
+            decided_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submission_decisions_thread "
+        "ON submission_decisions (thread_id, decided_at)")
+
+
+async def migration_reminder_deadlines(db):
+    """Termin przypomnienia zapisany przy zgłoszeniu + indeks częściowy po otwartych."""
+    await add_column_if_missing(db, "submissions", "remind_at", "TIMESTAMP")
+    await db.execute(
+        "UPDATE submissions SET remind_at = datetime(created_at, ?) WHERE remind_at IS NULL",
+        (f"+{DEFAULT_GUILD_CONFIG['reminder_delay_days']} days",))
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submissions_remind ON submissions (remind_at) "
+        "WHERE status IN ('pending', 'in_progress') AND reminder_sent = 0")
+
+
+async def migration_guild_config(db):
+    """Trwała konfiguracja per serwer (wcześniej tylko w zmiennych globalnych)."""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS guild_config (
+            guild_id TEXT PRIMARY KEY,
+            log_channel_id INTEGER,
+            notifications TEXT NOT NULL DEFAULT '{}',
+            reminders_enabled INTEGER NOT NULL DEFAULT 0,
+            reminder_delay_days INTEGER NOT NULL DEFAULT 3,
+            shop_channel_id INTEGER
+        )''')
+
+
+async def migration_bot_state(db):
+    """Prosty magazyn klucz-wartość na stan bota (np. hash zsynchronizowanych komend)."""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS bot_state (
+            key TEXT PRIMARY KEY, value TEXT
+        )''')
+
+
+async def migration_poll_votes(db):
+    """Głosy w ankietach jako wiersze (jeden głos na użytkownika) zamiast bloba JSON."""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS poll_votes (
+            message_id INTEGER NOT NULL, user_id INTEGER NOT NULL,
+            option INTEGER NOT NULL,
+            PRIMARY KEY (message_id, user_id)
+        )''')
+    async with db.execute("SELECT message_id, votes FROM polls") as cursor:
+        polls = await cursor.fetchall()
+    rows = []
+    for message_id, votes_json in polls:
+        for option, voter_ids in json.loads(votes_json).items():
+            rows.extend((message_id, int(uid), int(option)) for uid in voter_ids)
+    await db.executemany(
+        "INSERT OR REPLACE INTO poll_votes (message_id, user_id, option) VALUES (?, ?, ?)", rows)
+    await db.execute("UPDATE polls SET votes = '{}'")
+
+
+async def migration_event_attendees(db):
+    """Zapisani na wydarzenia jako wiersze zamiast listy JSON w events.attendees."""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS event_attendees (
+            message_id INTEGER NOT NULL, user_id INTEGER NOT NULL,
+            PRIMARY KEY (message_id, user_id)
+        )''')
+    async with db.execute("SELECT message_id, attendees FROM events") as cursor:
+        events = await cursor.fetchall()
+    rows = [(message_id, int(user_id))
+            for message_id, attendees in events for user_id in json.loads(attendees)]
+    await db.executemany(
+        "INSERT OR IGNORE INTO event_attendees (message_id, user_id) VALUES (?, ?)", rows)
+    await db.execute("UPDATE events SET attendees = '[]'")
+
+
+async def migration_reputation_ledger(db):
+    """Księga zmian reputacji (tylko dopisywanie) - reputation_points zostaje jako zmaterializowane saldo."""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS reputation_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL, delta INTEGER NOT NULL, balance INTEGER NOT NULL,
+            source TEXT NOT NULL, reason TEXT, actor_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+    # (user_id, created_at) + niejawny rowid: historia od najnowszych i saldo na dzień bez sortowania
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reputation_ledger_user ON reputation_ledger (user_id, created_at)")
+    # Saldo otwarcia dla istniejących kont, żeby księga sumowała się do reputation_points
+    await db.execute('''
+        INSERT INTO reputation_ledger (user_id, delta, balance, source, reason)
+        SELECT user_id, points, points, 'migration', 'Saldo początkowe'
+        FROM reputation_points WHERE points != 0''')
+
+
+async def migration_user_names(db):
+    """Ostatnio znane nazwy użytkowników - ranking i statystyki dla osób spoza cache/serwera."""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS user_names (
+            user_id TEXT PRIMARY KEY, display_name TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+
+
+async def migration_submission_rollup(db):
+    """Dzienne podsumowanie zgłoszeń (złożone / rozpatrzone) dla /statystyki."""
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS submission_daily (
+            day TEXT NOT NULL, kind TEXT NOT NULL, server TEXT NOT NULL DEFAULT '',
+            submitted INTEGER NOT NULL DEFAULT 0, decided INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, kind, server)
+        )''')
+    await db.execute('''
+        INSERT INTO submission_daily (day, kind, server, submitted)
+        SELECT date(created_at), kind, COALESCE(server, ''), COUNT(*)
+        FROM submissions GROUP BY 1, 2, 3''')
+    await db.execute('''
+        INSERT INTO submission_daily (day, kind, server, decided)
+        SELECT date(d.decided_at), s.kind, COALESCE(s.server, ''), COUNT(*)
+        FROM submission_decisions d JOIN submissions s ON s.thread_id = d.thread_id
+        WHERE true GROUP BY 1, 2, 3
+        ON CONFLICT (day, kind, server) DO UPDATE SET decided = decided + excluded.decided''')
+
+
+async def migration_panel_render_hash(db):
+    """Odcisk ostatnio wysłanego embedu panelu rekrutacji - odświeżenie bez zmian nie edytuje wiadomości."""
+    await add_column_if_missing(db, "recruitment_panels", "render_hash", "TEXT")
+
+
+MIGRATIONS = [
+    migration_base_schema,
+    migration_indexes,
+    migration_submissions,
+    migration_decision_ledger,
+    migration_reminder_deadlines,
+    migration_guild_config,
+    migration_bot_state,
+    migration_poll_votes,
+    migration_event_attendees,
+    migration_reputation_ledger,
+    migration_user_names,
+    migration_submission_rollup,
+    migration_panel_render_hash,
+]
+
 
-        await db.commit()
+async def run_migrations():
+    async with database.write() as db:
+        async with db.execute("PRAGMA user_version") as cursor:
+            current_version = (await cursor.fetchone())[0]
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        if version <= current_version:
+            continue
+        async with database.write() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            await migration(db)
+            await db.execute(f"PRAGMA user_version = {version}")
+        print(f"Zastosowano migrację bazy #{version} ({migration.__name__}).")
+
+
+async def init_database():
+    """Otwiera połączenia i migruje schemat - tylko raz na proces."""
+    if database.started:
+        return
+    await database.start()
+    await run_migrations()
 
 # =========================================================
 # --- FUNKCJE POMOCNICZE BAZY DANYCH ---
 # =========================================================
-async def save_suggestion(user_id, username, category, description, reason, server, thread_id):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            'INSERT INTO suggestions (user_id,username,category,description,reason,server,thread_id) VALUES (?,?,?,?,?,?,?)',
-            (user_id, username, category, description, reason, server, thread_id))
-        await db.commit()
+async def get_bot_state(key: str) -> Optional[str]:
+    async with database.read() as db:
+        async with db.execute("SELECT value FROM bot_state WHERE key = ?", (key,)) as cursor:
+            row = await cursor.fetchone()
+    return row[0] if row else None
 
-async def save_bug_report(user_id, category, bug_type, description, evidence, server, thread_id):
-    async with aiosqlite.connect(DB_PATH) as db:
+async def set_bot_state(key: str, value: str):
+    async with database.write() as db:
         await db.execute(
-            'INSERT INTO bug_reports (user_id,category,bug_type,description,evidence,server,thread_id) VALUES (?,?,?,?,?,?,?)',
-            (user_id, category, bug_type, description, evidence, server, thread_id))
-        await db.commit()
+            "INSERT INTO bot_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+def db_timestamp(dt: datetime) -> str:
+    """Format kolumn CURRENT_TIMESTAMP (UTC) - do porównań z created_at."""
+    return dt.astimezone(pytz.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def parse_db_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value).replace(tzinfo=pytz.utc)
+
+# Rodzaje zgłoszeń w tabeli submissions (kolejność = kolejność wyświetlania)
+SUBMISSION_KINDS = {
+    "suggestion":  "Propozycje",
+    "bug_report":  "Błędy",
+    "complaint":   "Skargi",
+    "appeal":      "Odwołania",
+    "application": "Podania",
+}
 
-async def save_complaint(user_id, complaint_type, target_user, data, server, thread_id):
-    async with aiosqlite.connect(DB_PATH) as db:
+async def save_submission(kind, post_type, user_id, server, thread_id, payload: dict, guild_id=None):
+    delay_days = guild_config.get(guild_id)["reminder_delay_days"]
+    remind_at = datetime.now(pytz.utc) + timedelta(days=delay_days)
+    async with database.write() as db:
+        cursor = await db.execute(
+            'INSERT INTO submissions (kind,type,server,user_id,thread_id,guild_id,payload,remind_at) VALUES (?,?,?,?,?,?,?,?)',
+            (kind, post_type, server, user_id, thread_id, guild_id, json.dumps(payload), db_timestamp(remind_at)))
+        submission_id = cursor.lastrowid
         await db.execute(
-            'INSERT INTO complaints (user_id,complaint_type,target_user,data,server,thread_id) VALUES (?,?,?,?,?,?)',
-            (user_id, complaint_type, target_user, json.dumps(data), server, thread_id))
-        await db.commit()
-
-async def save_appeal(user_id, appeal_type, data, server, thread_id):
-    async with aiosqlite.connect(DB_PATH) as db:
+            "INSERT INTO submission_daily (day, kind, server, submitted) VALUES (date('now'), ?, ?, 1) "
+            "ON CONFLICT (day, kind, server) DO UPDATE SET submitted = submitted + 1", (kind, server or ''))
+    stats_service.invalidate()
+    reminder_scheduler.schedule(remind_at, submission_id, guild_id, thread_id, post_type)
+    return submission_id
+
+async def save_suggestion(user_id, username, category, description, reason, server, thread_id, guild_id=None):
+    await save_submission(
+        "suggestion", category, user_id, server, thread_id,
+        {"username": username, "description": description, "reason": reason}, guild_id)
+
+async def save_bug_report(user_id, category, bug_type, description, evidence, server, thread_id, guild_id=None):
+    await save_submission(
+        "bug_report", category, user_id, server, thread_id,
+        {"bug_type": bug_type, "description": description, "evidence": evidence}, guild_id)
+
+async def save_complaint(user_id, complaint_type, target_user, data, server, thread_id, guild_id=None):
+    await save_submission(
+        "complaint", complaint_type, user_id, server, thread_id,
+        {"target_user": target_user, "data": data}, guild_id)
+
+async def save_appeal(user_id, appeal_type, data, server, thread_id, guild_id=None):
+    await save_submission("appeal", appeal_type, user_id, server, thread_id, {"data": data}, guild_id)
+
+async def save_application(user_id, username, app_type, data, thread_id, guild_id=None):
+    await save_submission(
+        "application", app_type, user_id, 'Nieokreślony', thread_id,
+        {"username": username, "data": data}, guild_id)
+
+async def record_decision(thread_id, action: str, new_status: str, moderator_id, reason: str = None):
+    """Zapisuje decyzję do księgi i zmienia status zgłoszenia w jednej transakcji."""
+    async with database.write() as db:
         await db.execute(
-            'INSERT INTO appeals (user_id,appeal_type,data,server,thread_id) VALUES (?,?,?,?,?)',
-            (user_id, appeal_type, json.dumps(data), server, thread_id))
-        await db.commit()
-
-async def save_application(user_id, username, app_type, data, thread_id):
-    async with aiosqlite.connect(DB_PATH) as db:
+            "INSERT INTO submission_decisions (thread_id, action, moderator_id, reason) VALUES (?,?,?,?)",
+            (str(thread_id), action, str(moderator_id), reason or None))
         await db.execute(
-            'INSERT INTO applications (user_id,username,application_type,data,thread_id) VALUES (?,?,?,?,?)',
-            (user_id, username, app_type, json.dumps(data), thread_id))
-        await db.commit()
-
-async def update_reputation(user_id: int, points: int, mode: str = 'add'):
-    async with aiosqlite.connect(DB_PATH) as db:
+            "UPDATE submissions SET status = ? WHERE thread_id = ?", (new_status, str(thread_id)))
         await db.execute(
-            "INSERT OR IGNORE INTO reputation_points (user_id, points) VALUES (?, 0)", (str(user_id),))
-        if mode == 'add':
-            await db.execute(
-                "UPDATE reputation_points SET points = points + ? WHERE user_id = ?", (points, str(user_id)))
-        elif mode == 'set':
-            await db.execute(
-                "UPDATE reputation_points SET points = ? WHERE user_id = ?", (points, str(user_id)))
-        await db.commit()
+            "INSERT INTO submission_daily (day, kind, server, decided) "
+            "SELECT date('now'), kind, COALESCE(server, ''), 1 FROM submissions WHERE thread_id = ? "
+            "ON CONFLICT (day, kind, server) DO UPDATE SET decided = decided + 1", (str(thread_id),))
+    stats_service.invalidate()
+
+async def append_reputation_ledger(db, user_id, delta: int, balance: int,
+                                   source: str, reason: str = None, actor_id=None):
+    await db.execute(
+        "INSERT INTO reputation_ledger (user_id, delta, balance, source, reason, actor_id) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (str(user_id), delta, balance, source, reason or None, str(actor_id) if actor_id else None))
+
+async def update_reputation(user_id: int, points: int, mode: str = 'add',
+                            source: str = 'manual', reason: str = None, actor_id=None):
+    """
+    Zmienia saldo i dopisuje wpis do reputation_ledger w jednej transakcji.
+    source: decision / purchase / manual. Zwraca nowe saldo.
+    """
+    async with database.write() as db:
+        if mode == 'set':
+            async with db.execute(
+                "SELECT points FROM reputation_points WHERE user_id = ?", (str(user_id),)) as cursor:
+                row = await cursor.fetchone()
+            delta = points - (row[0] if row else 0)
+        else:
+            delta = points
+        async with db.execute(
+            "INSERT INTO reputation_points (user_id, points) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET points = points + ? RETURNING points",
+            (str(user_id), delta, delta)) as cursor:
+            balance = (await cursor.fetchone())[0]
+        if delta:
+            await append_reputation_ledger(db, user_id, delta, balance, source, reason, actor_id)
+    leaderboard.set(user_id, balance)
+    return balance
+
+async def get_reputation_history(user_id, limit: int = 10, offset: int = 0) -> list:
+    """Wpisy księgi od najnowszych: (delta, balance, source, reason, actor_id, created_at)."""
+    async with database.read() as db:
+        async with db.execute(
+            "SELECT delta, balance, source, reason, actor_id, created_at FROM reputation_ledger "
+            "WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+            (str(user_id), limit, offset)) as cursor:
+            return await cursor.fetchall()
+
+async def get_reputation_balance_at(user_id, moment: datetime) -> int:
+    """Saldo z ostatniego wpisu księgi przed podaną chwilą."""
+    async with database.read() as db:
+        async with db.execute(
+            "SELECT balance FROM reputation_ledger WHERE user_id = ? AND created_at < ? "
+            "ORDER BY created_at DESC, id DESC LIMIT 1",
+            (str(user_id), db_timestamp(moment))) as cursor:
+            row = await cursor.fetchone()
+    return row[0] if row else 0
+
+async def purchase_item(user_id: int, item_id: int) -> dict:
+    """
+    Atomowy zakup w jednej transakcji BEGIN IMMEDIATE: warunkowe UPDATE stanu (stock > 0)
+    i salda (points >= cost) + zapis posiadania roli. Wynik w kluczu "status":
+    ok / not_found / sold_out / already_owned / insufficient_funds.
+    """
+    async with database.write() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        async with db.execute(
+            "SELECT name, cost, role_id, stock, category FROM shop_items WHERE id = ?", (item_id,)) as cursor:
+            item = await cursor.fetchone()
+        if not item:
+            return {"status": "not_found"}
+        name, cost, role_id, stock, category = item
+        result = {"name": name, "cost": cost, "role_id": role_id, "category": category,
+                  "stock_changed": stock is not None}
+
+        if stock is not None:
+            cursor = await db.execute(
+                "UPDATE shop_items SET stock = stock - 1 WHERE id = ? AND stock > 0", (item_id,))
+            if cursor.rowcount == 0:
+                return {**result, "status": "sold_out"}
+        if category == "Specjalne role":
+            cursor = await db.execute(
+                "INSERT OR IGNORE INTO shop_purchases (user_id, item_id) VALUES (?, ?)", (user_id, item_id))
+            if cursor.rowcount == 0:
+                await db.rollback()
+                return {**result, "status": "already_owned"}
+        async with db.execute(
+            "UPDATE reputation_points SET points = points - ? WHERE user_id = ? AND points >= ? RETURNING points",
+            (cost, str(user_id), cost)) as cursor:
+            row = await cursor.fetchone()
+        if row:
+            await append_reputation_ledger(db, user_id, -cost, row[0], 'purchase', f"{name} (ID: {item_id})")
+            leaderboard.set(user_id, row[0])
+            return {**result, "status": "ok", "balance": row[0]}
+        await db.rollback()
         async with db.execute(
             "SELECT points FROM reputation_points WHERE user_id = ?", (str(user_id),)) as cursor:
             row = await cursor.fetchone()
-            return row[0]
+    return {**result, "status": "insufficient_funds", "balance": row[0] if row else 0}
+
+# =========================================================
+# --- RANKING REPUTACJI ---
+# =========================================================
+class Leaderboard:
+    """
+    Ranking reputacji w pamięci: lista posortowana po (-punkty, user_id) + saldo per użytkownik.
+    Ładowany raz przy starcie, aktualizowany przy każdej zmianie salda.
+    Pozycja i strony rankingu liczone bisectem - bez zapytań do SQLite.
+    """
+    PAGE_SIZE = 10
+
+    def __init__(self):
+        self._order = []
+        self._points = {}
+
+    async def load(self):
+        async with database.read() as db:
+            async with db.execute("SELECT user_id, points FROM reputation_points") as cursor:
+                rows = await cursor.fetchall()
+        self._points = {str(user_id): points for user_id, points in rows}
+        self._order = sorted((-points, user_id) for user_id, points in self._points.items())
+
+    def __len__(self):
+        return len(self._order)
+
+    def set(self, user_id, points: int):
+        user_id = str(user_id)
+        old = self._points.get(user_id)
+        if old is not None:
+            del self._order[bisect.bisect_left(self._order, (-old, user_id))]
+        self._points[user_id] = points
+        bisect.insort(self._order, (-points, user_id))
+
+    def rank(self, user_id) -> Optional[tuple]:
+        """(miejsce, punkty) - remisy dzielą miejsce; None gdy użytkownik nie ma salda."""
+        points = self._points.get(str(user_id))
+        if points is None:
+            return None
+        return bisect.bisect_left(self._order, (-points,)) + 1, points
+
+    def page(self, page: int) -> list:
+        """Strona rankingu (od 1) jako lista (miejsce, user_id, punkty)."""
+        start = (page - 1) * self.PAGE_SIZE
+        return [(bisect.bisect_left(self._order, (neg_points,)) + 1, user_id, -neg_points)
+                for neg_points, user_id in self._order[start:start + self.PAGE_SIZE]]
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self._order) // self.PAGE_SIZE))
+
+
+leaderboard = Leaderboard()
+
+
+class NameResolver:
+    """
+    Nazwy użytkowników do rankingów: cache członków -> snapshot z user_names -> jedno
+    zbiorcze query_members dla reszty. Snapshot odświeżany zdarzeniami członków.
+    """
+    QUERY_CHUNK = 100
+
+    def __init__(self):
+        self._names = {}
+
+    async def load(self):
+        async with database.read() as db:
+            async with db.execute("SELECT user_id, display_name FROM user_names") as cursor:
+                self._names = {user_id: name for user_id, name in await cursor.fetchall()}
+
+    async def remember(self, members):
+        """Zapisuje nazwy, które zmieniły się względem snapshotu (jeden executemany)."""
+        changed = [(str(m.id), m.display_name) for m in members
+                   if self._names.get(str(m.id)) != m.display_name]
+        if not changed:
+            return
+        async with database.write() as db:
+            await db.executemany(
+                "INSERT INTO user_names (user_id, display_name) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET display_name = excluded.display_name, "
+                "updated_at = CURRENT_TIMESTAMP", changed)
+        self._names.update(changed)
+
+    async def resolve(self, guild: discord.Guild, user_ids) -> dict:
+        """Zwraca {user_id (str): nazwa} dla całej listy - bez zapytań REST per wiersz."""
+        names, seen, missing = {}, [], []
+        for user_id in map(str, user_ids):
+            member = guild.get_member(int(user_id))
+            if member:
+                names[user_id] = member.display_name
+                seen.append(member)
+            elif user_id in self._names:
+                names[user_id] = self._names[user_id]
+            else:
+                missing.append(int(user_id))
+        for i in range(0, len(missing), self.QUERY_CHUNK):
+            try:
+                found = await guild.query_members(user_ids=missing[i:i + self.QUERY_CHUNK], limit=self.QUERY_CHUNK)
+            except (asyncio.TimeoutError, discord.HTTPException) as e:
+                print(f"Błąd pobierania członków do rankingu: {e}")
+                break
+            for member in found:
+                names[str(member.id)] = member.display_name
+            seen.extend(found)
+        await self.remember(seen)
+        for user_id in map(str, user_ids):
+            names.setdefault(user_id, f"Użytkownik (ID: {user_id})")
+        return names
+
+
+name_resolver = NameResolver()
+
+# =========================================================
+# --- KONFIGURACJA SERWERÓW ---
+# =========================================================
+class GuildConfigStore:
+    """
+    Konfiguracja per serwer (logi, powiadomienia, przypomnienia, sklep).
+    Ładowana raz przy starcie do pamięci, zmiany zapisywane od razu do bazy.
+    """
+    def __init__(self):
+        self._cache = {}
+
+    async def load(self):
+        async with database.read() as db:
+            async with db.execute(
+                "SELECT guild_id, log_channel_id, notifications, reminders_enabled, "
+                "reminder_delay_days, shop_channel_id FROM guild_config") as cursor:
+                rows = await cursor.fetchall()
+        self._cache = {
+            int(guild_id): {
+                "log_channel_id":      log_channel_id,
+                "notifications":       json.loads(notifications),
+                "reminders_enabled":   bool(reminders_enabled),
+                "reminder_delay_days": delay_days,
+                "shop_channel_id":     shop_channel_id,
+            }
+            for guild_id, log_channel_id, notifications, reminders_enabled, delay_days, shop_channel_id in rows
+        }
+
+    def get(self, guild_id) -> dict:
+        """Zwracany słownik traktuj jako tylko do odczytu - zmiany przez update()."""
+        config = self._cache.get(int(guild_id)) if guild_id else None
+        return config if config is not None else {**DEFAULT_GUILD_CONFIG, "notifications": {}}
+
+    async def update(self, guild_id: int, **changes) -> dict:
+        config = {**self.get(guild_id), **changes}
+        async with database.write() as db:
+            await db.execute(
+                "INSERT INTO guild_config (guild_id, log_channel_id, notifications, reminders_enabled, "
+                "reminder_delay_days, shop_channel_id) VALUES (?,?,?,?,?,?) "
+                "ON CONFLICT(guild_id) DO UPDATE SET log_channel_id = excluded.log_channel_id, "
+                "notifications = excluded.notifications, reminders_enabled = excluded.reminders_enabled, "
+                "reminder_delay_days = excluded.reminder_delay_days, shop_channel_id = excluded.shop_channel_id",
+                (str(guild_id), config["log_channel_id"], json.dumps(config["notifications"]),
+                 int(config["reminders_enabled"]), config["reminder_delay_days"], config["shop_channel_id"]))
+        self._cache[int(guild_id)] = config
+        return config
+
+
+guild_config = GuildConfigStore()
 
 # =========================================================
 # --- PUNKT 1: COOLDOWN NA PODANIA ---
@@ -353,7 +1009,7 @@ async def check_application_cooldown(user_id: str, app_type: str) -> Optional[da
     """
     Zwraca datę końca cooldownu jeśli aktywny, None jeśli brak.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.read() as db:
         async with db.execute(
             "SELECT rejected_at FROM application_cooldowns WHERE user_id = ? AND application_type = ?",
             (user_id, app_type)) as cursor:
@@ -368,29 +1024,29 @@ async def check_application_cooldown(user_id: str, app_type: str) -> Optional[da
     if now < cooldown_end:
         return cooldown_end
     # Cooldown minął - usuń wpis
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.write() as db:
         await db.execute(
             "DELETE FROM application_cooldowns WHERE user_id = ? AND application_type = ?",
             (user_id, app_type))
-        await db.commit()
+    stats_service.invalidate()
     return None
 
 async def set_application_cooldown(user_id: str, app_type: str):
     """Ustawia cooldown po odrzuceniu podania."""
     now = datetime.now(POLAND_TZ).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.write() as db:
         await db.execute(
             "INSERT OR REPLACE INTO application_cooldowns (user_id, application_type, rejected_at) VALUES (?,?,?)",
             (user_id, app_type, now))
-        await db.commit()
+    stats_service.invalidate()
 
 async def remove_application_cooldown(user_id: str, app_type: str):
     """Zdejmuje cooldown z użytkownika."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.write() as db:
         await db.execute(
             "DELETE FROM application_cooldowns WHERE user_id = ? AND application_type = ?",
             (user_id, app_type))
-        await db.commit()
+    stats_service.invalidate()
 
 # =========================================================
 # --- PUNKT 3: ANTYSPAM PODAŃ ---
@@ -399,9 +1055,9 @@ async def check_active_application(user_id: str, app_type: str) -> bool:
     """
     Zwraca True jeśli użytkownik ma już aktywne (nierozpatrzone) podanie tego typu.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.read() as db:
         async with db.execute(
-            "SELECT id FROM applications WHERE user_id = ? AND application_type = ? AND status = 'pending'",
+            "SELECT id FROM submissions WHERE user_id = ? AND kind = 'application' AND type = ? AND status = 'pending'",
             (user_id, app_type)) as cursor:
             row = await cursor.fetchone()
     return row is not None
@@ -409,27 +1065,152 @@ async def check_active_application(user_id: str, app_type: str) -> bool:
 # =========================================================
 # --- FUNKCJE POMOCNICZE ---
 # =========================================================
+class RoleRegistry:
+    """
+    Nazwy ról z konfiguracji rozwiązane na ID raz per serwer.
+    Listy uprawnień trzymane jako frozensety ID - sprawdzenie to przecięcie zbiorów.
+    Unieważniane przy tworzeniu/zmianie/usunięciu roli.
+    """
+    def __init__(self):
+        self._guilds = {}
+
+    def invalidate(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+
+    def _index(self, guild: discord.Guild) -> dict:
+        index = self._guilds.get(guild.id)
+        if index is None:
+            by_name = {}
+            for role in guild.roles:
+                by_name.setdefault(role.name, []).append(role.id)
+            index = self._guilds[guild.id] = {"by_name": by_name, "sets": {}}
+        return index
+
+    def ids(self, guild: discord.Guild, role_names) -> frozenset:
+        index = self._index(guild)
+        key = tuple(role_names)
+        ids = index["sets"].get(key)
+        if ids is None:
+            ids = index["sets"][key] = frozenset(
+                role_id for name in role_names for role_id in index["by_name"].get(name, ()))
+        return ids
+
+    def role(self, guild: discord.Guild, name: str) -> Optional[discord.Role]:
+        role_ids = self._index(guild)["by_name"].get(name)
+        return guild.get_role(role_ids[0]) if role_ids else None
+
+    def member_has_any(self, member: discord.Member, role_names) -> bool:
+        return not self.ids(member.guild, role_names).isdisjoint(role.id for role in member.roles)
+
+
+role_registry = RoleRegistry()
+
 def is_authorized(interaction: discord.Interaction, required_roles: list) -> bool:
     if interaction.user.guild_permissions.administrator:
         return True
-    return any(role.name in required_roles for role in interaction.user.roles)
+    return role_registry.member_has_any(interaction.user, required_roles)
 
 def has_permission_for_type(user: discord.Member, item_type: str) -> bool:
     if user.guild_permissions.administrator:
         return True
-    item_lower = item_type.lower()
-    if any(x in item_lower for x in ["jb", "supermoce", "surf", "dr", "projekt rpg", "deathrun"]):
-        return any(role.name in ["Opiekun JB", "Zarząd", "Właściciel"] for role in user.roles)
-    elif "discord" in item_lower or "dc" in item_lower:
-        return any(role.name in ["Opiekun Discord", "Zarząd", "Właściciel"] for role in user.roles)
-    elif any(x in item_lower for x in ["skarga", "odwołanie", "propozycja", "błąd"]):
-        return any(role.name in ["Opiekun JB", "Opiekun Discord", "Zarząd", "Właściciel"] for role in user.roles)
-    return False
+    required_roles = POST_TYPE_ROLES.get(item_type)
+    return bool(required_roles) and role_registry.member_has_any(user, required_roles)
+
+class ActionLogQueue:
+    """
+    Bufor logów akcji (write-behind). log_action tylko dokłada embed do kolejki,
+    a zadanie w tle wysyła je paczkami do 10 embedów na wiadomość.
+    """
+    MAX_EMBEDS     = 10      # limit Discorda na wiadomość
+    MAX_CHARS      = 6000    # limit Discorda na łączną długość embedów w wiadomości
+    FLUSH_INTERVAL = 2.0
+    MAX_RETRIES    = 5
+
+    def __init__(self):
+        self._pending = {}   # channel_id -> (kanał, [embedy])
+        self._has_items = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Kończy zadanie w tle (po bieżącej paczce) i wysyła to, co zostało w kolejce."""
+        self._closing = True
+        self._has_items.set()
+        self._full.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Błąd podczas wysyłania logów: {e}")
+
+    def enqueue(self, channel: discord.abc.Messageable, embed: discord.Embed):
+        _, embeds = self._pending.setdefault(channel.id, (channel, []))
+        embeds.append(embed)
+        self._has_items.set()
+        if len(embeds) >= self.MAX_EMBEDS:
+            self._full.set()
+
+    async def _run(self):
+        while not self._closing:
+            await self._has_items.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._has_items.clear()
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Błąd podczas wysyłania logów: {e}")
+
+    def _batches(self, embeds: list):
+        batch, size = [], 0
+        for embed in embeds:
+            if batch and (len(batch) >= self.MAX_EMBEDS or size + len(embed) > self.MAX_CHARS):
+                yield batch
+                batch, size = [], 0
+            batch.append(embed)
+            size += len(embed)
+        if batch:
+            yield batch
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        for channel, embeds in pending.values():
+            for batch in self._batches(embeds):
+                await self._send(channel, batch)
+
+    async def _send(self, channel, embeds: list):
+        for attempt in range(self.MAX_RETRIES):
+            try:
+                await channel.send(embeds=embeds)
+                return
+            except discord.RateLimited as e:
+                await asyncio.sleep(e.retry_after)
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    return
+                retry_after = float(e.response.headers.get("Retry-After", 2 ** attempt))
+                await asyncio.sleep(retry_after)
+
+
+action_log = ActionLogQueue()
+
 
 async def log_action(guild: discord.Guild, action: str, user: discord.Member, details: str = ""):
-    if not LOG_CHANNEL_ID:
+    log_channel_id = guild_config.get(guild.id)["log_channel_id"]
+    if not log_channel_id:
         return
-    log_channel = guild.get_channel(LOG_CHANNEL_ID)
+    log_channel = guild.get_channel(log_channel_id)
     if not log_channel:
         return
     embed = discord.Embed(title="📋 Log Akcji", color=COLORS["main"], timestamp=datetime.now(POLAND_TZ))
@@ -439,13 +1220,11 @@ async def log_action(guild: discord.Guild, action: str, user: discord.Member, de
         embed.add_field(name="📝 Szczegóły", value=details, inline=False)
     embed.set_thumbnail(url=user.display_avatar.url)
     embed.set_footer(text=f"ID: {user.id} | {FOOTER_TEXT}")
-    try:
-        await log_channel.send(embed=embed)
-    except discord.HTTPException:
-        pass
+    action_log.enqueue(log_channel, embed)
 
 async def send_notification(guild: discord.Guild, post_type: str, thread_url: str, is_reminder: bool = False):
-    config = NOTIFICATION_CONFIG.get(post_type)
+    guild_settings = guild_config.get(guild.id)
+    config = guild_settings["notifications"].get(post_type)
     if not config:
         return
     channel = guild.get_channel(config['channel_id'])
@@ -454,7 +1233,7 @@ async def send_notification(guild: discord.Guild, post_type: str, thread_url: st
     role_mention = f"<@&{config['role_id']}>" if config.get('role_id') else ""
     title = f"⏰ Przypomnienie: {post_type}" if is_reminder else f"🔔 Nowe zgłoszenie: {post_type}"
     description = (
-        f"Zgłoszenie czeka na reakcję od ponad {REMINDER_CONFIG['delay_days']} dni.\n\n[Przejdź do posta]({thread_url})"
+        f"Zgłoszenie czeka na reakcję od ponad {guild_settings['reminder_delay_days']} dni.\n\n[Przejdź do posta]({thread_url})"
         if is_reminder else
         f"Nowy post czeka na Twoją uwagę.\n\n[Przejdź do posta]({thread_url})"
     )
@@ -472,78 +1251,232 @@ async def send_notification(guild: discord.Guild, post_type: str, thread_url: st
     except discord.HTTPException:
         pass
 
+# =========================================================
+# --- CACHE RENDERÓW WIADOMOŚCI ---
+# =========================================================
+class RenderCache:
+    """
+    Odcisk (hash) ostatnio wysłanego embedu/widoku per wiadomość (LRU).
+    Edycja z identyczną treścią jest pomijana - bez wywołania REST.
+    Znacznik czasu embedu nie wchodzi do odcisku.
+    """
+    MAX_CACHED = 1024
+
+    def __init__(self):
+        self._fingerprints = collections.OrderedDict()
+        self.saved = 0
+
+    @staticmethod
+    def fingerprint(embed: Optional[discord.Embed] = None, view: Optional[discord.ui.View] = None) -> str:
+        payload = {}
+        if embed is not None:
+            payload["embed"] = {k: v for k, v in embed.to_dict().items() if k != "timestamp"}
+        if view is not None:
+            payload["view"] = view.to_components()
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def remember(self, message_id: int, fingerprint: str):
+        self._fingerprints[message_id] = fingerprint
+        self._fingerprints.move_to_end(message_id)
+        while len(self._fingerprints) > self.MAX_CACHED:
+            self._fingerprints.popitem(last=False)
+
+    def is_current(self, message_id: int, fingerprint: str) -> bool:
+        """True (i licznik zaoszczędzonych edycji +1) gdy wiadomość już pokazuje tę treść."""
+        if self._fingerprints.get(message_id) == fingerprint:
+            self.saved += 1
+            return True
+        return False
+
+    async def edit(self, edit, message_id: int, **payload) -> bool:
+        """Wywołuje edit(**payload) tylko gdy treść się zmieniła. Zwraca True gdy edycja poszła."""
+        fingerprint = self.fingerprint(payload.get("embed"), payload.get("view"))
+        if self.is_current(message_id, fingerprint):
+            return False
+        await edit(**payload)
+        self.remember(message_id, fingerprint)
+        return True
+
+
+render_cache = RenderCache()
+
 # =========================================================
 # --- PUNKT 2: TAGI - FUNKCJE POMOCNICZE ---
 # =========================================================
-def find_tag(forum_channel, tag_name: str) -> Optional[discord.ForumTag]:
-    tag = discord.utils.get(forum_channel.available_tags, name=tag_name)
-    if tag:
-        return tag
-    for available_tag in forum_channel.available_tags:
-        if tag_name.lower() in available_tag.name.lower() or available_tag.name.lower() in tag_name.lower():
-            return available_tag
-    return None
+SERVER_TAG_POST_TYPES = ["Propozycja", "Błąd", "Skarga", "Odwołanie"]
 
-def get_tag_name_for_post(post_type: str, server: str = None) -> str:
-    if server and server != "Nieokreślony":
+def _tag_name_for_post(post_type: str, server: str = None) -> str:
+    if server:
         full_tag = f"{post_type} {server}"
         if full_tag in TAG_MAPPING:
             return TAG_MAPPING[full_tag]
         server_map = {"JailBreak": "JB", "DeathRun": "DR"}
-        short_server = server_map.get(server, server)
-        full_tag_short = f"{post_type} {short_server}"
-        if full_tag_short in TAG_MAPPING:
-            return TAG_MAPPING[full_tag_short]
-        return full_tag
-    else:
-        return TAG_MAPPING.get(post_type, post_type)
+        full_tag_short = f"{post_type} {server_map.get(server, server)}"
+        return TAG_MAPPING.get(full_tag_short, full_tag)
+    return TAG_MAPPING.get(post_type, post_type)
+
+# (typ zgłoszenia, serwer) -> nazwa tagu, liczone raz przy starcie
+POST_TAG_NAMES = {
+    **{(post_type, server): _tag_name_for_post(post_type, server)
+       for post_type in SERVER_TAG_POST_TYPES for server in SERVER_LIST},
+    **{(post_type, None): _tag_name_for_post(post_type)
+       for post_type in SERVER_TAG_POST_TYPES + ALL_RECRUITMENT_TYPES},
+}
+
+class ForumTagIndex:
+    """
+    Tagi forum per kanał: nazwa (bez rozróżniania wielkości liter) -> tag oraz gotowa
+    tabela (typ zgłoszenia, serwer) -> tag. Budowany przy pierwszym użyciu,
+    przebudowywany po provisioningu tagów i przy zmianie tagów w on_guild_channel_update.
+    """
+    def __init__(self):
+        self._forums = {}
+
+    def rebuild(self, forum: discord.ForumChannel):
+        self._forums.pop(forum.id, None)
+        self._index(forum)
+
+    def _index(self, forum: discord.ForumChannel) -> dict:
+        index = self._forums.get(forum.id)
+        if index is None:
+            by_name = {}
+            for tag in forum.available_tags:
+                by_name.setdefault(tag.name.lower(), tag)
+            by_post = {}
+            for (post_type, server), tag_name in POST_TAG_NAMES.items():
+                # Brak tagu z serwerem -> tag samego typu (np. "Propozycja")
+                tag = by_name.get(tag_name.lower()) or (by_name.get(post_type.lower()) if server else None)
+                if tag:
+                    by_post[(post_type, server)] = tag
+            index = self._forums[forum.id] = {"by_name": by_name, "by_post": by_post}
+        return index
+
+    def get(self, forum: discord.ForumChannel, tag_name: str) -> Optional[discord.ForumTag]:
+        return self._index(forum)["by_name"].get(tag_name.lower())
+
+    def for_post(self, forum: discord.ForumChannel, post_type: str,
+                 server: str = None) -> Optional[discord.ForumTag]:
+        if server == "Nieokreślony":
+            server = None
+        return self._index(forum)["by_post"].get((post_type, server))
+
+
+tag_index = ForumTagIndex()
+
+# Limity Discorda dla tagów forum
+MAX_FORUM_TAGS     = 20
+MAX_TAG_NAME_CHARS = 20
+
+# Typy zgłoszeń obsługiwane przez panel danego forum
+FORUM_PANEL_POST_TYPES = {
+    "proposals_bugs":       ["Propozycja", "Błąd"],
+    "complaints_appeals":   ["Skarga", "Odwołanie"],
+    "recruitment":          ADMIN_RECRUITMENT_TYPES,
+    "creative_recruitment": CREATIVE_RECRUITMENT_TYPES,
+}
+
+def required_forum_tags(panel_type: str) -> list:
+    """Nazwy tagów potrzebne panelowi, w kolejności ważności: statusy, typ x serwer, sam typ."""
+    post_types = FORUM_PANEL_POST_TYPES[panel_type]
+    names = list(STATUS_TAG_NAMES.values())
+    names += [POST_TAG_NAMES[(post_type, server)]
+              for post_type in post_types for server in SERVER_LIST if (post_type, server) in POST_TAG_NAMES]
+    names += [POST_TAG_NAMES[(post_type, None)] for post_type in post_types]
+    return list(dict.fromkeys(names))
+
+async def provision_forum_tags(forum: discord.ForumChannel, panel_type: str) -> dict:
+    """
+    Dokłada brakujące tagi jednym ForumChannel.edit (w limicie 20 tagów) i rozgrzewa indeks tagów.
+    Zwraca {"created": [...], "skipped": [...]} - pominięte przez limit liczby tagów lub długości nazwy.
+    """
+    existing = {tag.name.lower() for tag in forum.available_tags}
+    missing  = [name for name in required_forum_tags(panel_type) if name.lower() not in existing]
+    fitting  = [name for name in missing if len(name) <= MAX_TAG_NAME_CHARS]
+    room     = max(0, MAX_FORUM_TAGS - len(forum.available_tags))
+    created  = fitting[:room]
+    skipped  = [name for name in missing if name not in created]
+    if created:
+        edited = await forum.edit(
+            available_tags=list(forum.available_tags) + [discord.ForumTag(name=name) for name in created])
+        forum = edited or forum
+    tag_index.rebuild(forum)
+    return {"created": created, "skipped": skipped}
+
+async def provision_forum_tags_summary(forum: discord.ForumChannel, panel_type: str) -> str:
+    """Provisioning tagów dla komend setup - zwraca linijkę do odpowiedzi."""
+    try:
+        result = await provision_forum_tags(forum, panel_type)
+    except discord.HTTPException as e:
+        print(f"Błąd tworzenia tagów forum {forum.id}: {e}")
+        return "\n⚠️ Nie udało się utworzyć tagów forum (sprawdź uprawnienie Zarządzanie kanałami)."
+    summary = f"\n🏷️ Utworzono tagów: **{len(result['created'])}**."
+    if result["skipped"]:
+        summary += f"\n⚠️ Pominięte (limit Discorda): {', '.join(result['skipped'])}"
+    return summary
 
 # =========================================================
 # --- PUNKT 4: ZARZĄDZANIE TAGAMI STATUSU ---
 # =========================================================
-async def update_thread_status_tag(thread: discord.Thread, new_status: str):
+def status_tags_for(thread: discord.Thread, new_status: str) -> Optional[list]:
     """
-    Aktualizuje tag statusu wątku (Oczekuje/W trakcie/Zamknięte).
-    new_status: 'pending' | 'in_progress' | 'closed'
+    Tagi wątku po zmianie statusu (Oczekuje/W trakcie/Zamknięte) - do przekazania w thread.edit.
+    new_status: 'pending' | 'in_progress' | 'closed'. None gdy wątek nie jest na forum.
     """
-    try:
-        forum = thread.parent
-        if not isinstance(forum, discord.ForumChannel):
-            return
-
-        status_tag_name = STATUS_TAG_NAMES.get(new_status)
-        if not status_tag_name:
-            return
-
-        new_status_tag = find_tag(forum, status_tag_name)
+    forum = thread.parent
+    if not isinstance(forum, discord.ForumChannel):
+        return None
+    status_tag_name = STATUS_TAG_NAMES.get(new_status)
+    if not status_tag_name:
+        return None
 
-        # Usuń stare tagi statusu, zachowaj tagi typów
-        status_tag_names_all = set(STATUS_TAG_NAMES.values())
-        current_tags = [t for t in thread.applied_tags if t.name not in status_tag_names_all]
+    new_status_tag = tag_index.get(forum, status_tag_name)
 
-        if new_status_tag:
-            current_tags.append(new_status_tag)
+    # Usuń stare tagi statusu, zachowaj tagi typów
+    status_tag_names_all = set(STATUS_TAG_NAMES.values())
+    current_tags = [t for t in thread.applied_tags if t.name not in status_tag_names_all]
 
-        # Discord limit: max 5 tagów
-        current_tags = current_tags[:5]
+    if new_status_tag:
+        current_tags.append(new_status_tag)
 
-        await thread.edit(applied_tags=current_tags)
-    except Exception as e:
-        print(f"Błąd podczas aktualizacji tagu statusu: {e}")
+    # Discord limit: max 5 tagów
+    return current_tags[:5]
 
 # =========================================================
 # --- PUNKT 2: BUDOWANIE EMBEDU PANELU REKRUTACJI ---
 # =========================================================
-async def build_recruitment_embed(panel_type: str) -> discord.Embed:
+class RecruitmentStatusStore:
+    """
+    Status rekrutacji (otwarta/zamknięta) w pamięci, zapisywany write-through do recruitment_status.
+    Kliknięcia w panelach nie dotykają bazy.
+    """
+    def __init__(self):
+        self._status = {}
+
+    async def load(self):
+        async with database.read() as db:
+            async with db.execute("SELECT position, is_open FROM recruitment_status") as cursor:
+                self._status = {position: bool(is_open) for position, is_open in await cursor.fetchall()}
+
+    def is_open(self, position: str) -> bool:
+        return self._status.get(position, True)
+
+    async def set(self, position: str, is_open: bool):
+        async with database.write() as db:
+            await db.execute(
+                "INSERT OR REPLACE INTO recruitment_status (position, is_open) VALUES (?, ?)",
+                (position, int(is_open)))
+        self._status[position] = is_open
+        stats_service.invalidate()
+
+
+recruitment_status = RecruitmentStatusStore()
+
+
+def build_recruitment_embed(panel_type: str) -> discord.Embed:
     """
     Buduje embed panelu rekrutacji z aktualnym statusem stanowisk.
     panel_type: 'recruitment' | 'creative_recruitment'
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT position, is_open FROM recruitment_status") as cursor:
-            rows = await cursor.fetchall()
-    status_map = {row[0]: row[1] for row in rows}
-
     if panel_type == "recruitment":
         title = "🛡️ Centrum Rekrutacji Administracji"
         description_lines = [
@@ -564,7 +1497,7 @@ async def build_recruitment_embed(panel_type: str) -> discord.Embed:
         positions = CREATIVE_RECRUITMENT_TYPES
 
     for pos in positions:
-        is_open = status_map.get(pos, 1)
+        is_open = recruitment_status.is_open(pos)
         # Emoji zamiast koloru (Discord nie wspiera kolorowych tagów w embedzie)
         status_emoji = "🟢" if is_open else "🔴"
         status_text = "Otwarta" if is_open else "Zamknięta"
@@ -837,11 +1770,11 @@ class EventModal(discord.ui.Modal, title="Nowe wydarzenie"):
         embed.set_footer(text=f"Wydarzenie zorganizowane przez: {interaction.user.display_name} | {FOOTER_TEXT}")
         role_mention = self.role.mention if self.role else ""
         message = await self.channel.send(content=role_mention, embed=embed, view=EventView(initial_count=0))
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with database.write() as db:
             await db.execute(
-                "INSERT INTO events (message_id, author_id, attendees) VALUES (?, ?, ?)",
-                (message.id, interaction.user.id, json.dumps([])))
-            await db.commit()
+                "INSERT INTO events (message_id, author_id, attendees) VALUES (?, ?, '[]')",
+                (message.id, interaction.user.id))
+        event_signups.created(message.id)
         await interaction.response.send_message("✅ Wydarzenie zostało pomyślnie opublikowane.", ephemeral=True)
 
 
@@ -911,40 +1844,41 @@ class EditItemModal(discord.ui.Modal, title="Edytuj przedmiot w sklepie"):
 
     async def on_submit(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with database.read() as db:
             async with db.execute(
-                "SELECT name, cost, description, stock FROM shop_items WHERE id = ?",
+                "SELECT name, cost, description, stock, category FROM shop_items WHERE id = ?",
                 (self.item_id,)) as cursor:
                 item = await cursor.fetchone()
-            if not item:
-                await interaction.followup.send("❌ Przedmiot nie istnieje.", ephemeral=True)
-                return
+        if not item:
+            await interaction.followup.send("❌ Przedmiot nie istnieje.", ephemeral=True)
+            return
+
+        old_name, old_cost, old_desc, old_stock, category = item
+        new_name_val  = self.new_name.value.strip()  or old_name
+        new_desc_val  = self.new_desc.value.strip()  or old_desc
 
-            old_name, old_cost, old_desc, old_stock = item
-            new_name_val  = self.new_name.value.strip()  or old_name
-            new_desc_val  = self.new_desc.value.strip()  or old_desc
+        try:
+            new_cost_val = int(self.new_cost.value.strip()) if self.new_cost.value.strip() else old_cost
+            if new_cost_val < 1:
+                raise ValueError
+        except ValueError:
+            await interaction.followup.send("❌ Cena musi być liczbą całkowitą większą od 0.", ephemeral=True)
+            return
 
+        new_stock_val = old_stock
+        if self.new_stock.value.strip():
             try:
-                new_cost_val = int(self.new_cost.value.strip()) if self.new_cost.value.strip() else old_cost
-                if new_cost_val < 1:
-                    raise ValueError
+                v = int(self.new_stock.value.strip())
+                new_stock_val = None if v == -1 else v
             except ValueError:
-                await interaction.followup.send("❌ Cena musi być liczbą całkowitą większą od 0.", ephemeral=True)
+                await interaction.followup.send("❌ Stan magazynowy musi być liczbą (-1 = brak limitu).", ephemeral=True)
                 return
 
-            new_stock_val = old_stock
-            if self.new_stock.value.strip():
-                try:
-                    v = int(self.new_stock.value.strip())
-                    new_stock_val = None if v == -1 else v
-                except ValueError:
-                    await interaction.followup.send("❌ Stan magazynowy musi być liczbą (-1 = brak limitu).", ephemeral=True)
-                    return
-
+        async with database.write() as db:
             await db.execute(
                 "UPDATE shop_items SET name=?, cost=?, description=?, stock=? WHERE id=?",
                 (new_name_val, new_cost_val, new_desc_val, new_stock_val, self.item_id))
-            await db.commit()
+        await shop_catalog.refresh(category)
 
         stock_display = "nielimitowany" if new_stock_val is None else str(new_stock_val)
         await interaction.followup.send(
@@ -958,6 +1892,53 @@ class EditItemModal(discord.ui.Modal, title="Edytuj przedmiot w sklepie"):
 # =========================================================
 # --- WIDOK EVENTU ---
 # =========================================================
+class EventSignupStore:
+    """
+    Zapisy na wydarzenia: atomowy przełącznik w event_attendees
+    + licznik zapisanych per wydarzenie trzymany w pamięci (LRU).
+    """
+    MAX_CACHED = 256
+
+    def __init__(self):
+        self._counts = collections.OrderedDict()
+
+    def _remember(self, message_id: int, count: int):
+        self._counts[message_id] = count
+        self._counts.move_to_end(message_id)
+        while len(self._counts) > self.MAX_CACHED:
+            self._counts.popitem(last=False)
+
+    def created(self, message_id: int):
+        self._remember(message_id, 0)
+
+    async def toggle(self, message_id: int, user_id: int) -> Optional[tuple]:
+        """Zwraca (czy_zapisany, liczba_zapisanych) albo None gdy wydarzenie nie istnieje."""
+        async with database.write() as db:
+            count = self._counts.get(message_id)
+            if count is None:
+                async with db.execute(
+                    "SELECT (SELECT COUNT(*) FROM event_attendees WHERE message_id = e.message_id) "
+                    "FROM events e WHERE e.message_id = ?", (message_id,)) as cursor:
+                    row = await cursor.fetchone()
+                if row is None:
+                    return None
+                count = row[0]
+            cursor = await db.execute(
+                "DELETE FROM event_attendees WHERE message_id = ? AND user_id = ?", (message_id, user_id))
+            signed_up = cursor.rowcount == 0
+            if signed_up:
+                await db.execute(
+                    "INSERT INTO event_attendees (message_id, user_id) VALUES (?, ?)", (message_id, user_id))
+                count += 1
+            else:
+                count -= 1
+        self._remember(message_id, count)
+        return signed_up, count
+
+
+event_signups = EventSignupStore()
+
+
 class EventView(discord.ui.View):
     def __init__(self, initial_count: int = 0):
         super().__init__(timeout=None)
@@ -971,31 +1952,78 @@ class EventView(discord.ui.View):
 
     async def signup_callback(self, interaction: discord.Interaction):
         await interaction.response.defer()
-        async with aiosqlite.connect(DB_PATH) as db:
-            async with db.execute(
-                "SELECT attendees FROM events WHERE message_id = ?", (interaction.message.id,)) as cursor:
-                data = await cursor.fetchone()
-            if not data:
-                await interaction.followup.send("❌ Wystąpił błąd z tym wydarzeniem.", ephemeral=True)
-                return
-            attendees = json.loads(data[0])
-            user_id = interaction.user.id
-            if user_id in attendees:
-                attendees.remove(user_id)
-                await interaction.followup.send("✅ Zostałeś wypisany z wydarzenia.", ephemeral=True)
-            else:
-                attendees.append(user_id)
-                await interaction.followup.send("✅ Zostałeś zapisany na wydarzenie!", ephemeral=True)
-            await db.execute(
-                "UPDATE events SET attendees = ? WHERE message_id = ?",
-                (json.dumps(attendees), interaction.message.id))
-            await db.commit()
-        self.signup_button.label = f"Zapisz się! ({len(attendees)})"
-        await interaction.edit_original_response(view=self)
+        result = await event_signups.toggle(interaction.message.id, interaction.user.id)
+        if result is None:
+            await interaction.followup.send("❌ Wystąpił błąd z tym wydarzeniem.", ephemeral=True)
+            return
+        signed_up, count = result
+        if signed_up:
+            await interaction.followup.send("✅ Zostałeś zapisany na wydarzenie!", ephemeral=True)
+        else:
+            await interaction.followup.send("✅ Zostałeś wypisany z wydarzenia.", ephemeral=True)
+        # Widok renderowany per wiadomość - zarejestrowana instancja jest współdzielona przez wszystkie eventy
+        await render_cache.edit(interaction.edit_original_response, interaction.message.id,
+                                view=EventView(initial_count=count))
 
 # =========================================================
 # --- LOGIKA DECYZJI ---
 # =========================================================
+# Role nadawane przy akceptacji podania
+APPLICATION_ROLES = {
+    "Podanie Admin JB":          ["Junior Admin JB", "Administracja JB"],
+    "Podanie Zaufany JB":         ["Zaufany JB", "Administracja JB"],
+    "Podanie Admin DC":           ["Admin Discord"],
+    "Podanie Admin Supermoce":    ["Admin Supermoce"],
+    "Podanie Admin Surf + RPG":   ["Admin Surf + RPG"],
+    "Podanie Admin DR":           ["Admin DR"],
+    "Podanie Admin Projekt RPG":  ["Admin Projekt RPG"],
+}
+
+# Czasy etapów ostatnich decyzji (commit / efekty / wątek) w sekundach
+decision_timings = collections.deque(maxlen=100)
+_background_tasks = set()
+
+def run_in_background(coro):
+    """Zadanie w tle z trzymaną referencją (inaczej GC może je przerwać)."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+def record_decision_timings(action: str, timings: dict):
+    decision_timings.append({"action": action, **timings})
+
+def average_decision_timings() -> dict:
+    """Średni czas każdego etapu (w sekundach) z ostatnich decyzji."""
+    totals = collections.defaultdict(list)
+    for entry in decision_timings:
+        for stage, seconds in entry.items():
+            if stage != "action":
+                totals[stage].append(seconds)
+    return {stage: sum(values) / len(values) for stage, values in totals.items()}
+
+async def grant_application_roles(member: discord.Member, post_type: str, thread: discord.Thread):
+    try:
+        roles_to_add = [role_registry.role(member.guild, n) for n in APPLICATION_ROLES.get(post_type, [])]
+        valid_roles = [r for r in roles_to_add if r]
+        if valid_roles:
+            await member.add_roles(*valid_roles, reason=f"Akceptacja podania: {post_type}")
+    except discord.Forbidden:
+        await thread.send(f"⚠️ **Błąd uprawnień!** Nie udało się nadać roli {member.mention}.")
+    except Exception as e:
+        print(f"Błąd podczas nadawania roli: {e}")
+
+async def notify_decision(guild: discord.Guild, moderator: discord.Member, thread: discord.Thread,
+                          author_id: int, dm_message: str, decision_text: str):
+    if dm_message:
+        try:
+            member = guild.get_member(author_id)
+            if member:
+                await member.send(dm_message)
+        except discord.HTTPException:
+            pass
+    await log_action(guild, f"Zarządzano postem: {decision_text}", moderator, f"Post: {thread.mention}")
+
 async def process_decision(interaction: discord.Interaction, original_interaction: discord.Interaction,
                             action: str, post_type: str, author_id: int, reason_text: str):
     try:
@@ -1003,23 +2031,30 @@ async def process_decision(interaction: discord.Interaction, original_interactio
         original_embed   = original_message.embeds[0]
 
         action_map = {
-            "accept_suggestion":  {"text": "Propozycja przyjęta",           "color": COLORS["success"], "points": 5, "prefix": "[Zaakceptowane]", "final": True,  "status_tag": "closed"},
-            "reject_suggestion":  {"text": "Propozycja odrzucona",          "color": COLORS["error"],   "points": 0, "prefix": "[Odrzucone]",     "final": True,  "status_tag": "closed"},
-            "accept_bug":         {"text": "W trakcie naprawy",             "color": COLORS["warn"],    "points": 0, "prefix": "[W trakcie]",     "final": False, "status_tag": "in_progress"},
-            "resolve_bug":        {"text": "Naprawiony",                    "color": COLORS["success"], "points": 3, "prefix": "[Naprawione]",    "final": True,  "status_tag": "closed"},
-            "reject_bug":         {"text": "Zgłoszenie odrzucone",          "color": COLORS["error"],   "points": 0, "prefix": "[Odrzucone]",     "final": True,  "status_tag": "closed"},
-            "accept_complaint":   {"text": "Skarga rozpatrzona pozytywnie", "color": COLORS["success"], "points": 0, "prefix": "[Zaakceptowane]", "final": True,  "status_tag": "closed"},
-            "reject_complaint":   {"text": "Skarga odrzucona",              "color": COLORS["error"],   "points": 0, "prefix": "[Odrzucone]",     "final": True,  "status_tag": "closed"},
-            "accept_appeal":      {"text": "Odwołanie zaakceptowane",       "color": COLORS["success"], "points": 0, "prefix": "[Zaakceptowane]", "final": True,  "status_tag": "closed"},
-            "reject_appeal":      {"text": "Odwołanie odrzucone",           "color": COLORS["error"],   "points": 0, "prefix": "[Odrzucone]",     "final": True,  "status_tag": "closed"},
-            "accept_application": {"text": "Podanie przyjęte",              "color": COLORS["success"], "points": 0, "prefix": "[Zaakceptowane]", "final": True,  "status_tag": "closed"},
-            "reject_application": {"text": "Podanie odrzucone",             "color": COLORS["error"],   "points": 0, "prefix": "[Odrzucone]",     "final": True,  "status_tag": "closed"},
+            "accept_suggestion":  {"text": "Propozycja przyjęta",           "color": COLORS["success"], "points": 5, "prefix": "[Zaakceptowane]", "final": True,  "status_tag": "closed", "status": "accepted"},
+            "reject_suggestion":  {"text": "Propozycja odrzucona",          "color": COLORS["error"],   "points": 0, "prefix": "[Odrzucone]",     "final": True,  "status_tag": "closed", "status": "rejected"},
+            "accept_bug":         {"text": "W trakcie naprawy",             "color": COLORS["warn"],    "points": 0, "prefix": "[W trakcie]",     "final": False, "status_tag": "in_progress", "status": "in_progress"},
+            "resolve_bug":        {"text": "Naprawiony",                    "color": COLORS["success"], "points": 3, "prefix": "[Naprawione]",    "final": True,  "status_tag": "closed", "status": "resolved"},
+            "reject_bug":         {"text": "Zgłoszenie odrzucone",          "color": COLORS["error"],   "points": 0, "prefix": "[Odrzucone]",     "final": True,  "status_tag": "closed", "status": "rejected"},
+            "accept_complaint":   {"text": "Skarga rozpatrzona pozytywnie", "color": COLORS["success"], "points": 0, "prefix": "[Zaakceptowane]", "final": True,  "status_tag": "closed", "status": "accepted"},
+            "reject_complaint":   {"text": "Skarga odrzucona",              "color": COLORS["error"],   "points": 0, "prefix": "[Odrzucone]",     "final": True,  "status_tag": "closed", "status": "rejected"},
+            "accept_appeal":      {"text": "Odwołanie zaakceptowane",       "color": COLORS["success"], "points": 0, "prefix": "[Zaakceptowane]", "final": True,  "status_tag": "closed", "status": "accepted"},
+            "reject_appeal":      {"text": "Odwołanie odrzucone",           "color": COLORS["error"],   "points": 0, "prefix": "[Odrzucone]",     "final": True,  "status_tag": "closed", "status": "rejected"},
+            "accept_application": {"text": "Podanie przyjęte",              "color": COLORS["success"], "points": 0, "prefix": "[Zaakceptowane]", "final": True,  "status_tag": "closed", "status": "accepted"},
+            "reject_application": {"text": "Podanie odrzucone",             "color": COLORS["error"],   "points": 0, "prefix": "[Odrzucone]",     "final": True,  "status_tag": "closed", "status": "rejected"},
         }
 
         action_details = action_map.get(action)
         if not action_details:
             return
 
+        timings = {}
+        stage_start = time.perf_counter()
+        thread = original_interaction.channel
+
+        await record_decision(thread.id, action, action_details["status"], interaction.user.id, reason_text)
+        timings["commit"] = time.perf_counter() - stage_start
+
         original_embed.color = action_details["color"]
         for i, field in enumerate(original_embed.fields):
             if field.name == "📊 Status":
@@ -1035,69 +2070,59 @@ async def process_decision(interaction: discord.Interaction, original_interactio
             decision_embed.set_thumbnail(url=LOGO_URL)
         decision_embed.set_footer(text=FOOTER_TEXT)
 
+        # --- Niezależne efekty decyzji - równolegle ---
+        effects = []
         if action_details["points"] > 0:
-            await update_reputation(author_id, action_details["points"], mode='add')
+            effects.append(update_reputation(
+                author_id, action_details["points"], mode='add', source='decision',
+                reason=f"{post_type}: {action_details['text']}", actor_id=interaction.user.id))
 
         dm_message = ""
 
         # --- PUNKT 1: Cooldown przy odrzuceniu podania ---
         if action == "reject_application":
             dm_message = f"❌ Niestety, Twoje podanie na **{post_type.replace('Podanie ', '')}** zostało odrzucone.\n⏳ Możesz złożyć nowe podanie za **{COOLDOWN_DAYS} dni**."
-            await set_application_cooldown(str(author_id), post_type)
+            effects.append(set_application_cooldown(str(author_id), post_type))
 
         elif action == "accept_application":
             dm_message = f"🎉 Gratulacje! Twoje podanie na **{post_type.replace('Podanie ', '')}** zostało zaakceptowane!"
             member = interaction.guild.get_member(author_id)
             if member:
-                try:
-                    roles_map = {
-                        "Podanie Admin JB":          ["Junior Admin JB", "Administracja JB"],
-                        "Podanie Zaufany JB":         ["Zaufany JB", "Administracja JB"],
-                        "Podanie Admin DC":           ["Admin Discord"],
-                        "Podanie Admin Supermoce":    ["Admin Supermoce"],
-                        "Podanie Admin Surf + RPG":   ["Admin Surf + RPG"],
-                        "Podanie Admin DR":           ["Admin DR"],
-                        "Podanie Admin Projekt RPG":  ["Admin Projekt RPG"],
-                    }
-                    roles_to_add_names = roles_map.get(post_type, [])
-                    roles_to_add = [discord.utils.get(interaction.guild.roles, name=n) for n in roles_to_add_names]
-                    valid_roles = [r for r in roles_to_add if r]
-                    if valid_roles:
-                        await member.add_roles(*valid_roles, reason=f"Akceptacja podania: {post_type}")
-                except discord.Forbidden:
-                    await original_interaction.channel.send(
-                        f"⚠️ **Błąd uprawnień!** Nie udało się nadać roli {member.mention}.")
-                except Exception as e:
-                    print(f"Błąd podczas nadawania roli: {e}")
+                effects.append(grant_application_roles(member, post_type, thread))
 
         new_view = None if action_details["final"] else ManagementView(post_type, author_id, is_in_progress=True)
-        await original_message.edit(embed=original_embed, view=new_view)
-        await original_interaction.channel.send(embed=decision_embed)
-
-        # --- PUNKT 4: Aktualizacja tagu statusu ---
-        await update_thread_status_tag(original_interaction.channel, action_details["status_tag"])
-
+        effects.append(original_message.edit(embed=original_embed, view=new_view))
+        effects.append(thread.send(embed=decision_embed))
+
+        stage_start = time.perf_counter()
+        for result in await asyncio.gather(*effects, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"Błąd efektu decyzji w wątku {thread.id}: {result}")
+        timings["effects"] = time.perf_counter() - stage_start
+
+        # --- PUNKT 4: Tag statusu + zmiana nazwy/zamknięcie w jednym thread.edit ---
+        # Po wysłaniu wiadomości - zarchiwizowany i zablokowany wątek nie przyjmie już wiadomości
+        thread_changes = {}
+        applied_tags = status_tags_for(thread, action_details["status_tag"])
+        if applied_tags is not None:
+            thread_changes["applied_tags"] = applied_tags
         if action_details["final"]:
-            current_name = original_interaction.channel.name
-            new_name = f"{action_details['prefix']} {current_name}"
+            new_name = f"{action_details['prefix']} {thread.name}"
             if len(new_name) > 100:
                 new_name = new_name[:97] + "..."
+            thread_changes.update(name=new_name, locked=True, archived=True)
+        stage_start = time.perf_counter()
+        if thread_changes:
             try:
-                await original_interaction.channel.edit(name=new_name, locked=True, archived=True)
-            except discord.HTTPException:
-                pass
-
-        if dm_message:
-            try:
-                member = interaction.guild.get_member(author_id)
-                if member:
-                    await member.send(dm_message)
-            except discord.Forbidden:
-                pass
+                await thread.edit(**thread_changes)
+            except discord.HTTPException as e:
+                print(f"Błąd aktualizacji wątku {thread.id}: {e}")
+        timings["thread"] = time.perf_counter() - stage_start
 
-        await log_action(
-            interaction.guild, f"Zarządzano postem: {action_details['text']}",
-            interaction.user, f"Post: {original_interaction.channel.mention}")
+        # --- DM i log nie blokują odpowiedzi dla moderatora ---
+        run_in_background(notify_decision(
+            interaction.guild, interaction.user, thread, author_id, dm_message, action_details["text"]))
+        record_decision_timings(action, timings)
 
     except Exception as e:
         print(f"Błąd w process_decision: {e}")
@@ -1159,12 +2184,8 @@ async def create_generic_post(modal: discord.ui.Modal, interaction: discord.Inte
         )
 
         # --- PUNKT 2 & 4: Tagi typu + tag statusu "Oczekuje" ---
-        tag_name = get_tag_name_for_post(post_type, server)
-        type_tag = find_tag(forum_channel, tag_name)
-        if not type_tag and server:
-            type_tag = find_tag(forum_channel, post_type)
-
-        status_tag = find_tag(forum_channel, STATUS_TAG_NAMES["pending"])
+        type_tag   = tag_index.for_post(forum_channel, post_type, server)
+        status_tag = tag_index.get(forum_channel, STATUS_TAG_NAMES["pending"])
 
         applied_tags = []
         if type_tag:
@@ -1187,35 +2208,36 @@ async def create_generic_post(modal: discord.ui.Modal, interaction: discord.Inte
         # Zapis do bazy danych
         data = {item.label: item.value for item in modal.children if item.value}
 
+        guild_id = str(interaction.guild.id)
         if post_type == "Propozycja":
             await save_suggestion(
                 str(interaction.user.id), interaction.user.display_name, post_type,
                 data.get('Opis propozycji', ''),
                 data.get('Dlaczego ma zostać wprowadzona?', ''),
                 server or 'Nieokreślony',
-                str(thread_message.thread.id))
+                str(thread_message.thread.id), guild_id)
         elif post_type == "Błąd":
             await save_bug_report(
                 str(interaction.user.id), post_type, "Nieokreślony",
                 data.get('Opis błędu', ''),
                 data.get('Dowody (linki do screenów, filmów)', ''),
                 server or 'Nieokreślony',
-                str(thread_message.thread.id))
+                str(thread_message.thread.id), guild_id)
         elif post_type == "Skarga":
             await save_complaint(
                 str(interaction.user.id), post_type,
                 data.get('Nick osoby, na którą składasz skargę', ''),
                 data, server or 'Nieokreślony',
-                str(thread_message.thread.id))
+                str(thread_message.thread.id), guild_id)
         elif post_type == "Odwołanie":
             await save_appeal(
                 str(interaction.user.id), post_type,
                 data, server or 'Nieokreślony',
-                str(thread_message.thread.id))
+                str(thread_message.thread.id), guild_id)
         elif post_type.startswith("Podanie"):
             await save_application(
                 str(interaction.user.id), interaction.user.display_name, post_type,
-                data, str(thread_message.thread.id))
+                data, str(thread_message.thread.id), guild_id)
 
         await log_action(interaction.guild, f"Złożono: {full_type}", interaction.user,
                          f"Post: {thread_message.thread.mention}")
@@ -1313,12 +2335,7 @@ class ForumSelect(discord.ui.Select):
             return
 
         if choice == "Podanie Zaufany JB":
-            async with aiosqlite.connect(DB_PATH) as db:
-                async with db.execute(
-                    "SELECT is_open FROM recruitment_status WHERE position = ?", (choice,)) as cursor:
-                    status = await cursor.fetchone()
-                    is_open = status[0] if status else 1
-            if not is_open:
+            if not recruitment_status.is_open(choice):
                 await interaction.response.send_message(
                     "❌ Rekrutacja na to stanowisko jest obecnie zamknięta.", ephemeral=True)
                 return
@@ -1333,12 +2350,7 @@ class ForumSelect(discord.ui.Select):
             return
 
         if choice in CREATIVE_RECRUITMENT_TYPES:
-            async with aiosqlite.connect(DB_PATH) as db:
-                async with db.execute(
-                    "SELECT is_open FROM recruitment_status WHERE position = ?", (choice,)) as cursor:
-                    status = await cursor.fetchone()
-                    is_open = status[0] if status else 1
-            if not is_open:
+            if not recruitment_status.is_open(choice):
                 await interaction.response.send_message(
                     "❌ Rekrutacja na to stanowisko jest obecnie zamknięta.", ephemeral=True)
                 return
@@ -1374,12 +2386,7 @@ class AdminApplicationServerSelect(discord.ui.Select):
 
     async def callback(self, interaction: discord.Interaction):
         choice = self.values[0]
-        async with aiosqlite.connect(DB_PATH) as db:
-            async with db.execute(
-                "SELECT is_open FROM recruitment_status WHERE position = ?", (choice,)) as cursor:
-                status = await cursor.fetchone()
-                is_open = status[0] if status else 1
-        if not is_open:
+        if not recruitment_status.is_open(choice):
             await interaction.response.send_message(
                 "❌ Rekrutacja na to stanowisko jest obecnie zamknięta.", ephemeral=True)
             return
@@ -1572,90 +2579,265 @@ class TemplateReasonView(discord.ui.View):
 # =========================================================
 # --- SYSTEM ANKIET ---
 # =========================================================
+POLL_RENDER_WINDOW = 2.0     # s - najwyżej jedna edycja embedu ankiety na okno
+POLL_MAX_MENTIONS  = 40      # ile wzmianek pokazać w polu opcji (reszta jako licznik)
+
+
+class PollStore:
+    """
+    Stan ankiet w pamięci (LRU): pytanie, opcje i głosujący per opcja.
+    Ładowany raz przy pierwszym kliknięciu, głosy zapisywane upsertem do poll_votes.
+    """
+    MAX_CACHED = 256
+
+    def __init__(self):
+        self._polls = collections.OrderedDict()
+        self._load_lock = asyncio.Lock()
+
+    async def get(self, message_id: int) -> Optional[dict]:
+        poll = self._polls.get(message_id)
+        if poll is None:
+            async with self._load_lock:
+                poll = self._polls.get(message_id) or await self._load(message_id)
+            if poll is None:
+                return None
+        self._polls[message_id] = poll
+        self._polls.move_to_end(message_id)
+        # Ankieta z głosem w toku lub zaplanowanym renderem zostaje - po ponownym
+        # wczytaniu dostałaby nową blokadę i dwa słowniki rozjechałyby się w licznikach
+        for stale_id in list(self._polls):
+            if len(self._polls) <= self.MAX_CACHED:
+                break
+            if not self._busy(self._polls[stale_id]):
+                del self._polls[stale_id]
+        return poll
+
+    @staticmethod
+    def _busy(poll: dict) -> bool:
+        render_task = poll["render_task"]
+        return poll["pending_votes"] > 0 or (render_task is not None and not render_task.done())
+
+    async def _load(self, message_id: int) -> Optional[dict]:
+        async with database.read() as db:
+            async with db.execute(
+                "SELECT question, options, author_id FROM polls WHERE message_id = ?", (message_id,)) as cursor:
+                row = await cursor.fetchone()
+            if not row:
+                return None
+            async with db.execute(
+                "SELECT user_id, option FROM poll_votes WHERE message_id = ? ORDER BY rowid",
+                (message_id,)) as cursor:
+                votes = await cursor.fetchall()
+        question, options_json, author_id = row
+        options = json.loads(options_json)
+        # dict jako uporządkowany zbiór głosujących
+        voters = [dict() for _ in options]
+        choices = {}
+        for user_id, option in votes:
+            if 0 <= option < len(options):
+                voters[option][user_id] = None
+                choices[user_id] = option
+        return {"message_id": message_id, "question": question, "options": options, "author_id": author_id,
+                "author_name": None, "voters": voters, "choices": choices,
+                "fields": [None] * len(options), "rendered_at": 0.0, "render_task": None,
+                "lock": asyncio.Lock(), "pending_votes": 0}
+
+    async def vote(self, poll: dict, user_id: int, option: int) -> bool:
+        """Zwraca False gdy użytkownik już głosował na tę opcję."""
+        # Odczyt poprzedniego głosu, upsert i zmiana liczników jako jedna sekcja per ankieta;
+        # pending_votes liczy także czekających na blokadę, żeby LRU nie wyrzuciło ankiety
+        poll["pending_votes"] += 1
+        try:
+            async with poll["lock"]:
+                previous = poll["choices"].get(user_id)
+                if previous == option:
+                    return False
+                async with database.write() as db:
+                    await db.execute(
+                        "INSERT INTO poll_votes (message_id, user_id, option) VALUES (?, ?, ?) "
+                        "ON CONFLICT(message_id, user_id) DO UPDATE SET option = excluded.option",
+                        (poll["message_id"], user_id, option))
+                if previous is not None:
+                    poll["voters"][previous].pop(user_id, None)
+                    poll["fields"][previous] = None
+                poll["voters"][option][user_id] = None
+                poll["choices"][user_id] = option
+                poll["fields"][option] = None
+                return True
+        finally:
+            poll["pending_votes"] -= 1
+
+
+poll_store = PollStore()
+
+
+def render_poll_field(poll: dict, option: int) -> str:
+    """Wartość pola opcji - liczona tylko dla opcji zmienionych od ostatniego renderu."""
+    if poll["fields"][option] is None:
+        voters = poll["voters"][option]
+        if not voters:
+            value_text = "Brak głosów"
+        else:
+            value_text = "\n".join(f"<@{uid}>" for uid in itertools.islice(voters, POLL_MAX_MENTIONS))
+            if len(voters) > POLL_MAX_MENTIONS:
+                value_text += f"\n... i {len(voters) - POLL_MAX_MENTIONS} więcej"
+        poll["fields"][option] = value_text
+    return poll["fields"][option]
+
+
+def build_poll_embed(poll: dict) -> discord.Embed:
+    embed = discord.Embed(
+        title="📊 Ankieta", description=f"**{poll['question']}**", color=COLORS["main"])
+    for i, option_text in enumerate(poll["options"]):
+        embed.add_field(
+            name=f"{option_text} ({len(poll['voters'][i])})", value=render_poll_field(poll, i), inline=False)
+    embed.set_footer(text=f"Ankieta stworzona przez: {poll['author_name']} | {FOOTER_TEXT}")
+    if LOGO_URL:
+        embed.set_thumbnail(url=LOGO_URL)
+    return embed
+
+
 class PollView(discord.ui.View):
     def __init__(self, options: list, message_id: int = 0):
         super().__init__(timeout=None)
         self.message_id = message_id
         for i, option_text in enumerate(options):
-            self.add_item(PollButton(label=option_text, custom_id=f"poll_{message_id}_{i}"))
+            self.add_item(PollButton(message_id, i, label=option_text))
 
 
-class PollButton(discord.ui.Button):
+class PollButton(discord.ui.DynamicItem[discord.ui.Button], template=r"poll_(?P<message_id>\d+)_(?P<index>\d+)"):
+    """
+    Przycisk ankiety routowany po custom_id (poll_<message_id>_<index>) -
+    jedna rejestracja na wszystkie ankiety, stan ładowany dopiero przy kliknięciu.
+    """
+    def __init__(self, message_id: int, index: int, label: Optional[str] = None):
+        super().__init__(discord.ui.Button(label=label, custom_id=f"poll_{message_id}_{index}"))
+        self.message_id = message_id
+        self.index = index
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match):
+        return cls(int(match["message_id"]), int(match["index"]), label=item.label)
+
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.defer()
-        message_id   = int(self.custom_id.split('_')[1])
-        button_index = int(self.custom_id.split('_')[2])
+        poll = await poll_store.get(self.message_id)
+        if poll is None or self.index >= len(poll["options"]):
+            return
+        if not await poll_store.vote(poll, interaction.user.id, self.index):
+            return
+        if poll["author_name"] is None:
+            author = interaction.guild.get_member(poll["author_id"]) or await bot.fetch_user(poll["author_id"])
+            poll["author_name"] = author.display_name
+        request_poll_render(interaction.message, poll)
 
-        async with aiosqlite.connect(DB_PATH) as db:
-            async with db.execute(
-                "SELECT votes FROM polls WHERE message_id = ?", (message_id,)) as cursor:
-                votes_json = await cursor.fetchone()
-            if not votes_json:
-                return
-            votes = json.loads(votes_json[0])
-            voter_id_str = str(interaction.user.id)
-            for option_votes in votes.values():
-                if voter_id_str in option_votes:
-                    option_votes.remove(voter_id_str)
-            votes[str(button_index)].append(voter_id_str)
-            await db.execute(
-                "UPDATE polls SET votes = ? WHERE message_id = ?", (json.dumps(votes), message_id))
-            await db.commit()
 
-            async with db.execute(
-                "SELECT question, options, author_id FROM polls WHERE message_id = ?", (message_id,)) as cursor:
-                poll_data = await cursor.fetchone()
+def request_poll_render(message: discord.Message, poll: dict):
+    """
+    Seria głosów = jedna edycja. Jeśli render jest już zaplanowany, nowy głos
+    trafi do niego sam (embed budowany z bieżących liczników w chwili wysyłki).
+    """
+    if poll["render_task"] is not None:
+        return
+    delay = max(0.0, poll["rendered_at"] + POLL_RENDER_WINDOW - time.monotonic())
+    poll["render_task"] = asyncio.create_task(_render_poll_later(message, poll, delay))
 
-        question, options, author_id = poll_data
-        options = json.loads(options)
-        author  = interaction.guild.get_member(author_id) or await bot.fetch_user(author_id)
 
-        new_embed = discord.Embed(
-            title="📊 Ankieta", description=f"**{question}**", color=COLORS["main"])
-        for i, option_text in enumerate(options):
-            voter_ids     = votes.get(str(i), [])
-            voter_mentions= [f"<@{uid}>" for uid in voter_ids]
-            value_text    = "\n".join(voter_mentions) if voter_mentions else "Brak głosów"
-            if len(value_text) > 1024:
-                value_text = value_text[:1020] + "\n..."
-            new_embed.add_field(name=f"{option_text} ({len(voter_ids)})", value=value_text, inline=False)
-        new_embed.set_footer(text=f"Ankieta stworzona przez: {author.display_name} | {FOOTER_TEXT}")
-        if LOGO_URL:
-            new_embed.set_thumbnail(url=LOGO_URL)
-        await interaction.edit_original_response(embed=new_embed)
+async def _render_poll_later(message: discord.Message, poll: dict, delay: float):
+    await asyncio.sleep(delay)
+    # Zwolnienie slotu przed edycją - głos oddany w trakcie edycji zaplanuje kolejny render
+    poll["render_task"] = None
+    poll["rendered_at"] = time.monotonic()
+    try:
+        await render_cache.edit(message.edit, poll["message_id"], embed=build_poll_embed(poll))
+    except discord.HTTPException as e:
+        print(f"Błąd odświeżania ankiety {poll['message_id']}: {e}")
 
 # =========================================================
 # --- SYSTEM SKLEPU ---
 # =========================================================
-async def create_shop_embed(category: str):
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT id, name, cost, description, stock FROM shop_items WHERE category = ? ORDER BY cost ASC",
-            (category,)) as cursor:
-            items = await cursor.fetchall()
-    embed = discord.Embed(title=f"🛒 Sklep - Kategoria: {category}", color=COLORS["main"])
-    if not items:
-        embed.description = "Brak przedmiotów w tej kategorii."
-    else:
-        description = ""
-        for item_id, name, cost, desc, stock in items:
-            stock_info = ""
-            if stock is not None:
-                stock_info = f" (Pozostało: {stock} szt.)" if stock > 0 else " (Wyprzedane)"
-            description += f"**ID: {item_id} | {name}{stock_info}** — `{cost} rep.`\n*_{desc}_*\n\n"
-        embed.description = description
-    if LOGO_URL:
-        embed.set_thumbnail(url=LOGO_URL)
-    embed.set_footer(text=FOOTER_TEXT)
-    return embed
+class ShopCatalog:
+    """
+    Katalog sklepu w pamięci: przedmioty per kategoria z gotowym embedem i opcjami selecta.
+    Przełączanie kategorii nie dotyka bazy - po każdej zmianie w shop_items
+    przebudowywana jest tylko kategoria, której zmiana dotyczy.
+    """
+    def __init__(self):
+        self._categories = {}
+        self._item_category = {}
+
+    async def load(self):
+        async with database.read() as db:
+            async with db.execute(
+                "SELECT id, name, cost, description, stock, category FROM shop_items "
+                "ORDER BY category, cost ASC") as cursor:
+                rows = await cursor.fetchall()
+        grouped = {category: [] for category in SHOP_CATEGORIES}
+        for row in rows:
+            grouped.setdefault(row[5], []).append(row[:5])
+        self._categories.clear()
+        self._item_category.clear()
+        for category, items in grouped.items():
+            self._render(category, items)
+
+    async def refresh(self, category: Optional[str]):
+        """Przeładowuje jedną kategorię (None = cały katalog)."""
+        if category is None:
+            await self.load()
+            return
+        async with database.read() as db:
+            async with db.execute(
+                "SELECT id, name, cost, description, stock FROM shop_items WHERE category = ? ORDER BY cost ASC",
+                (category,)) as cursor:
+                items = await cursor.fetchall()
+        for item_id in [i for i, c in self._item_category.items() if c == category]:
+            del self._item_category[item_id]
+        self._render(category, items)
+
+    def _render(self, category: str, items: list):
+        embed = discord.Embed(title=f"🛒 Sklep - Kategoria: {category}", color=COLORS["main"])
+        options = []
+        if not items:
+            embed.description = "Brak przedmiotów w tej kategorii."
+        else:
+            description = ""
+            for item_id, name, cost, desc, stock in items:
+                stock_info = ""
+                if stock is not None:
+                    stock_info = f" (Pozostało: {stock} szt.)" if stock > 0 else " (Wyprzedane)"
+                description += f"**ID: {item_id} | {name}{stock_info}** — `{cost} rep.`\n*_{desc}_*\n\n"
+                self._item_category[item_id] = category
+            embed.description = description
+            # Select przyjmuje maksymalnie 25 opcji
+            for item_id, name, cost, desc, stock in items[:25]:
+                label = f"{name} — {cost} rep."
+                if stock is not None and stock <= 0:
+                    label += " (Wyprzedane)"
+                options.append(discord.SelectOption(label=label[:100], value=str(item_id),
+                                                    description=desc[:100] if desc else None))
+        if LOGO_URL:
+            embed.set_thumbnail(url=LOGO_URL)
+        embed.set_footer(text=FOOTER_TEXT)
+        self._categories[category] = {"embed": embed, "options": options}
+
+    def category_of(self, item_id: int) -> Optional[str]:
+        return self._item_category.get(item_id)
+
+    def embed(self, category: str) -> discord.Embed:
+        return self._categories[category]["embed"].copy()
+
+    def options(self, category: str) -> list:
+        return list(self._categories[category]["options"])
+
+
+shop_catalog = ShopCatalog()
 
 
 class ShopView(discord.ui.View):
     def __init__(self, initial_category: Optional[str] = None):
         super().__init__(timeout=None)
         self.add_item(ShopCategorySelect())
-        if initial_category:
-            self.add_item(ShopItemSelect(category=initial_category))
+        self.add_item(ShopItemSelect(category=initial_category or SHOP_CATEGORIES[0]))
 
 
 class ShopCategorySelect(discord.ui.Select):
@@ -1667,9 +2849,18 @@ class ShopCategorySelect(discord.ui.Select):
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.defer()
         selected_category = self.values[0]
-        new_embed = await create_shop_embed(selected_category)
+        new_embed = shop_catalog.embed(selected_category)
         new_view  = ShopView(initial_category=selected_category)
-        await interaction.edit_original_response(embed=new_embed, view=new_view)
+        await render_cache.edit(interaction.edit_original_response, interaction.message.id,
+                                embed=new_embed, view=new_view)
+
+
+PURCHASE_ERRORS = {
+    "not_found": "❌ Przedmiot nie znaleziony.",
+    "sold_out": "❌ Ten przedmiot jest już wyprzedany!",
+    "already_owned": "❌ Już posiadasz ten unikalny przedmiot!",
+    "insufficient_funds": "❌ Nie masz wystarczającej reputacji! Potrzebujesz **{cost}**, a masz **{balance}**.",
+}
 
 
 class ShopItemSelect(discord.ui.Select):
@@ -1677,61 +2868,27 @@ class ShopItemSelect(discord.ui.Select):
         super().__init__(placeholder="Wybierz przedmiot, który chcesz kupić...",
                          min_values=1, max_values=1, custom_id="shop_item_select")
         self.category = category
-        self.options  = [discord.SelectOption(label="Ładowanie...", value="loading")]
+        self.options  = shop_catalog.options(category)
+        if not self.options:
+            self.options  = [discord.SelectOption(label="Brak przedmiotów w tej kategorii", value="empty")]
+            self.disabled = True
 
     async def callback(self, interaction: discord.Interaction):
-        if self.values[0] == "loading":
-            await interaction.response.send_message("⏳ Proszę wybrać kategorię ponownie.", ephemeral=True)
+        if self.values[0] == "empty":
+            await interaction.response.send_message("❌ Brak przedmiotów w tej kategorii.", ephemeral=True)
             return
         await interaction.response.defer(ephemeral=True)
         item_id = int(self.values[0])
 
-        async with aiosqlite.connect(DB_PATH) as db:
-            async with db.execute(
-                "SELECT name, cost, role_id, stock, category FROM shop_items WHERE id = ?",
-                (item_id,)) as cursor:
-                item = await cursor.fetchone()
-            if not item:
-                await interaction.followup.send("❌ Przedmiot nie znaleziony.", ephemeral=True)
-                return
-
-            item_name, item_cost, role_id, stock, category = item
-
-            if stock is not None and stock <= 0:
-                await interaction.followup.send("❌ Ten przedmiot jest już wyprzedany!", ephemeral=True)
-                return
-
-            if category == "Specjalne role":
-                async with db.execute(
-                    "SELECT 1 FROM shop_purchases WHERE user_id = ? AND item_id = ?",
-                    (interaction.user.id, item_id)) as cursor:
-                    if await cursor.fetchone():
-                        await interaction.followup.send("❌ Już posiadasz ten unikalny przedmiot!", ephemeral=True)
-                        return
-
-            async with db.execute(
-                "SELECT points FROM reputation_points WHERE user_id = ?",
-                (str(interaction.user.id),)) as cursor:
-                user_points_row = await cursor.fetchone()
-            user_points = user_points_row[0] if user_points_row else 0
-
-            if user_points < item_cost:
-                await interaction.followup.send(
-                    f"❌ Nie masz wystarczającej reputacji! Potrzebujesz **{item_cost}**, a masz **{user_points}**.",
-                    ephemeral=True)
-                return
-
-            new_points = user_points - item_cost
-            await db.execute(
-                "UPDATE reputation_points SET points = ? WHERE user_id = ?",
-                (new_points, str(interaction.user.id)))
-            if stock is not None:
-                await db.execute("UPDATE shop_items SET stock = stock - 1 WHERE id = ?", (item_id,))
-            if category == "Specjalne role":
-                await db.execute(
-                    "INSERT INTO shop_purchases (user_id, item_id) VALUES (?, ?)",
-                    (interaction.user.id, item_id))
-            await db.commit()
+        result = await purchase_item(interaction.user.id, item_id)
+        if result["status"] != "ok":
+            await interaction.followup.send(PURCHASE_ERRORS[result["status"]].format(**result), ephemeral=True)
+            return
+        if result["stock_changed"]:
+            await shop_catalog.refresh(result["category"])
+        item_name, item_cost = result["name"], result["cost"]
+        role_id, category    = result["role_id"], result["category"]
+        new_points           = result["balance"]
 
         if role_id:
             try:
@@ -1753,11 +2910,12 @@ class ShopItemSelect(discord.ui.Select):
                 f"✅ Gratulacje! Kupiłeś **{item_name}** za **{item_cost}** reputacji. "
                 f"Twoje saldo: **{new_points}** rep.\nAdministracja została powiadomiona.", ephemeral=True)
 
-        if SHOP_CONFIG.get("channel_id") and category in ["VIP", "Premium", "Fajki", "Oferty Dnia"]:
-            notif_channel = bot.get_channel(SHOP_CONFIG["channel_id"])
+        shop_channel_id = guild_config.get(interaction.guild.id)["shop_channel_id"]
+        if shop_channel_id and category in ["VIP", "Premium", "Fajki", "Oferty Dnia"]:
+            notif_channel = interaction.guild.get_channel(shop_channel_id)
             if notif_channel:
                 roles_to_mention = [
-                    discord.utils.get(interaction.guild.roles, name=r_name)
+                    role_registry.role(interaction.guild, r_name)
                     for r_name in SHOP_CONFIG["manual_reward_roles"]]
                 role_mentions = " ".join([r.mention for r in roles_to_mention if r])
                 embed = discord.Embed(title="🛒 Nowy zakup w sklepie!",
@@ -1789,8 +2947,7 @@ async def setup_logi(interaction: discord.Interaction, kanal: discord.TextChanne
     if not is_authorized(interaction, SETUP_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    global LOG_CHANNEL_ID
-    LOG_CHANNEL_ID = kanal.id
+    await guild_config.update(interaction.guild.id, log_channel_id=kanal.id)
     await interaction.response.send_message(f"✅ Kanał logów: {kanal.mention}.", ephemeral=True)
     await log_action(interaction.guild, "Skonfigurowano logi", interaction.user, f"Kanał: {kanal.mention}")
 
@@ -1801,7 +2958,9 @@ async def setup_powiadomienia(interaction: discord.Interaction, typ_zgloszenia:
     if not is_authorized(interaction, SETUP_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    NOTIFICATION_CONFIG[typ_zgloszenia] = {'channel_id': kanal.id, 'role_id': rola.id if rola else None}
+    notifications = dict(guild_config.get(interaction.guild.id)["notifications"])
+    notifications[typ_zgloszenia] = {'channel_id': kanal.id, 'role_id': rola.id if rola else None}
+    await guild_config.update(interaction.guild.id, notifications=notifications)
     await interaction.response.send_message(
         f"✅ Ustawiono powiadomienia dla `{typ_zgloszenia}` na kanale {kanal.mention}" +
         (f" z rolą {rola.mention}." if rola else "."), ephemeral=True)
@@ -1813,8 +2972,12 @@ async def setup_przypomnienia(interaction: discord.Interaction, wlaczone: bool,
     if not is_authorized(interaction, SETUP_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    REMINDER_CONFIG["enabled"]    = wlaczone
-    REMINDER_CONFIG["delay_days"] = dni
+    delay_changed = guild_config.get(interaction.guild.id)["reminder_delay_days"] != dni
+    await guild_config.update(interaction.guild.id, reminders_enabled=wlaczone, reminder_delay_days=dni)
+    if delay_changed:
+        await reminder_scheduler.reschedule(interaction.guild.id, dni)
+    elif wlaczone:
+        await reminder_scheduler.load()
     status = "włączone" if wlaczone else "wyłączone"
     await interaction.response.send_message(
         f"✅ Przypomnienia **{status}**. Czas oczekiwania: **{dni} dni**.", ephemeral=True)
@@ -1832,10 +2995,12 @@ async def setup_forum_propozycje(interaction: discord.Interaction, kanal_forum:
     if LOGO_URL:
         embed.set_thumbnail(url=LOGO_URL)
     embed.set_footer(text=FOOTER_TEXT)
+    await interaction.response.defer(ephemeral=True)
+    tags_summary = await provision_forum_tags_summary(kanal_forum, "proposals_bugs")
     await kanal_forum.create_thread(
         name="Panel Zgłoszeń - Propozycje i Błędy", embed=embed,
         view=ForumSelectionView("proposals_bugs"))
-    await interaction.response.send_message(f"✅ Panel utworzony na {kanal_forum.mention}!", ephemeral=True)
+    await interaction.followup.send(f"✅ Panel utworzony na {kanal_forum.mention}!{tags_summary}", ephemeral=True)
 
 
 @bot.tree.command(name="setup_forum_skargi", description="Tworzy panel składania skarg i odwołań.")
@@ -1850,10 +3015,12 @@ async def setup_forum_skargi(interaction: discord.Interaction, kanal_forum: disc
     if LOGO_URL:
         embed.set_thumbnail(url=LOGO_URL)
     embed.set_footer(text=FOOTER_TEXT)
+    await interaction.response.defer(ephemeral=True)
+    tags_summary = await provision_forum_tags_summary(kanal_forum, "complaints_appeals")
     await kanal_forum.create_thread(
         name="Panel Zgłoszeń - Skargi i Odwołania", embed=embed,
         view=ForumSelectionView("complaints_appeals"))
-    await interaction.response.send_message(f"✅ Panel utworzony na {kanal_forum.mention}!", ephemeral=True)
+    await interaction.followup.send(f"✅ Panel utworzony na {kanal_forum.mention}!{tags_summary}", ephemeral=True)
 
 
 # --- PUNKT 2: SETUP REKRUTACJI Z ZAPISEM PANELU ---
@@ -1862,19 +3029,20 @@ async def setup_forum_rekrutacje(interaction: discord.Interaction, kanal_forum:
     if not is_authorized(interaction, SETUP_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    embed = await build_recruitment_embed("recruitment")
+    await interaction.response.defer(ephemeral=True)
+    tags_summary = await provision_forum_tags_summary(kanal_forum, "recruitment")
+    embed = build_recruitment_embed("recruitment")
     thread_msg = await kanal_forum.create_thread(
         name="Panel Rekrutacyjny - Administracja", embed=embed,
         view=ForumSelectionView("recruitment"))
     # Zapisz panel do bazy danych
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.write() as db:
         await db.execute(
             "INSERT INTO recruitment_panels (guild_id, channel_id, thread_id, message_id, panel_type) VALUES (?,?,?,?,?)",
             (str(interaction.guild.id), str(kanal_forum.id),
              str(thread_msg.thread.id), str(thread_msg.message.id), "recruitment"))
-        await db.commit()
-    await interaction.response.send_message(
-        f"✅ Panel rekrutacyjny utworzony na {kanal_forum.mention}!", ephemeral=True)
+    await interaction.followup.send(
+        f"✅ Panel rekrutacyjny utworzony na {kanal_forum.mention}!{tags_summary}", ephemeral=True)
 
 
 @bot.tree.command(name="setup_forum_rekrutacje_kreatywne",
@@ -1883,21 +3051,93 @@ async def setup_forum_rekrutacje_kreatywne(interaction: discord.Interaction, kan
     if not is_authorized(interaction, CREATIVE_RECRUITMENT_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    embed = await build_recruitment_embed("creative_recruitment")
+    await interaction.response.defer(ephemeral=True)
+    tags_summary = await provision_forum_tags_summary(kanal_forum, "creative_recruitment")
+    embed = build_recruitment_embed("creative_recruitment")
     thread_msg = await kanal_forum.create_thread(
         name="Panel Rekrutacyjny - Role Kreatywne", embed=embed,
         view=ForumSelectionView("creative_recruitment"))
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.write() as db:
         await db.execute(
             "INSERT INTO recruitment_panels (guild_id, channel_id, thread_id, message_id, panel_type) VALUES (?,?,?,?,?)",
             (str(interaction.guild.id), str(kanal_forum.id),
              str(thread_msg.thread.id), str(thread_msg.message.id), "creative_recruitment"))
-        await db.commit()
-    await interaction.response.send_message(
-        f"✅ Panel rekrutacji kreatywnej utworzony na {kanal_forum.mention}!", ephemeral=True)
+    await interaction.followup.send(
+        f"✅ Panel rekrutacji kreatywnej utworzony na {kanal_forum.mention}!{tags_summary}", ephemeral=True)
 
 
 # --- PUNKT 2: KOMENDA ODŚWIEŻANIA PANELU ---
+PANEL_REFRESH_CONCURRENCY = 5
+
+async def refresh_recruitment_panels(guild: discord.Guild, force: bool = False) -> tuple:
+    """
+    Odświeża wszystkie zapisane panele rekrutacji serwera: jeden embed na panel_type,
+    edycje przez PartialMessage (bez fetchy) równolegle, panele zwracające 404 usuwane z bazy.
+    force=True pomija zapisany odcisk - każdy panel dostaje edycję, więc usunięte wiadomości
+    zostają wykryte i wyczyszczone. Zwraca (odświeżone, bez zmian, błędy, usunięte).
+    """
+    async with database.read() as db:
+        async with db.execute(
+            "SELECT id, thread_id, message_id, panel_type, render_hash FROM recruitment_panels WHERE guild_id = ?",
+            (str(guild.id),)) as cursor:
+            panels = await cursor.fetchall()
+
+    embeds       = {panel_type: build_recruitment_embed(panel_type) for panel_type in {p[3] for p in panels}}
+    fingerprints = {panel_type: render_cache.fingerprint(embed) for panel_type, embed in embeds.items()}
+    semaphore    = asyncio.Semaphore(PANEL_REFRESH_CONCURRENCY)
+    missing      = []
+    rendered     = []
+
+    async def refresh(panel_id, thread_id, message_id, panel_type, render_hash) -> str:
+        # Odcisk trzymany w bazie - panel bez zmian nie jest edytowany także po restarcie
+        if not force and render_hash == fingerprints[panel_type]:
+            render_cache.saved += 1
+            return "unchanged"
+        message = bot.get_partial_messageable(int(thread_id)).get_partial_message(int(message_id))
+        async with semaphore:
+            try:
+                await message.edit(embed=embeds[panel_type])
+                rendered.append((fingerprints[panel_type], panel_id))
+                return "updated"
+            except discord.NotFound:
+                missing.append((panel_id,))
+                return "missing"
+            except discord.HTTPException as e:
+                print(f"Błąd odświeżania panelu (thread {thread_id}): {e}")
+            return "error"
+
+    results = await asyncio.gather(*(refresh(*panel) for panel in panels))
+    if missing or rendered:
+        async with database.write() as db:
+            await db.executemany("DELETE FROM recruitment_panels WHERE id = ?", missing)
+            await db.executemany("UPDATE recruitment_panels SET render_hash = ? WHERE id = ?", rendered)
+    return results.count("updated"), results.count("unchanged"), results.count("error"), len(missing)
+
+
+RECRUITMENT_REFRESH_DELAY = 5.0
+_recruitment_refresh_tasks = {}
+
+def schedule_recruitment_refresh(guild: discord.Guild):
+    """
+    Seria otwarć/zamknięć = jedno odświeżenie paneli. Zaplanowane odświeżenie
+    i tak zbuduje embedy z bieżącego statusu, więc kolejne zmiany tylko do niego dołączają.
+    """
+    task = _recruitment_refresh_tasks.get(guild.id)
+    if task is not None and not task.done():
+        return
+    _recruitment_refresh_tasks[guild.id] = run_in_background(_refresh_recruitment_later(guild))
+
+
+async def _refresh_recruitment_later(guild: discord.Guild):
+    await asyncio.sleep(RECRUITMENT_REFRESH_DELAY)
+    # Zwolnienie slotu przed edycjami - zmiana w trakcie zaplanuje kolejne odświeżenie
+    _recruitment_refresh_tasks.pop(guild.id, None)
+    try:
+        await refresh_recruitment_panels(guild)
+    except Exception as e:
+        print(f"Błąd odświeżania paneli rekrutacji: {e}")
+
+
 @bot.tree.command(name="odswiez_rekrutacje",
                   description="Odświeża embed panelu rekrutacji (aktualizuje statusy stanowisk).")
 async def odswiez_rekrutacje(interaction: discord.Interaction):
@@ -1906,41 +3146,28 @@ async def odswiez_rekrutacje(interaction: discord.Interaction):
         return
     await interaction.response.defer(ephemeral=True)
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT thread_id, message_id, panel_type FROM recruitment_panels WHERE guild_id = ?",
-            (str(interaction.guild.id),)) as cursor:
-            panels = await cursor.fetchall()
-
-    if not panels:
+    # Ręczne odświeżenie zawsze edytuje - tylko tak wychodzą na jaw usunięte panele
+    updated, unchanged, errors, pruned = await refresh_recruitment_panels(interaction.guild, force=True)
+    if not updated and not unchanged and not errors and not pruned:
         await interaction.followup.send(
             "❌ Nie znaleziono żadnych paneli rekrutacji. Użyj najpierw `/setup_forum_rekrutacje`.",
             ephemeral=True)
         return
 
-    updated = 0
-    errors  = 0
-    for thread_id, message_id, panel_type in panels:
-        try:
-            thread  = await interaction.guild.fetch_channel(int(thread_id))
-            message = await thread.fetch_message(int(message_id))
-            new_embed = await build_recruitment_embed(panel_type)
-            await message.edit(embed=new_embed)
-            updated += 1
-        except Exception as e:
-            print(f"Błąd odświeżania panelu (thread {thread_id}): {e}")
-            errors += 1
-
     result_msg = f"✅ Odświeżono **{updated}** panel(i) rekrutacji."
+    if unchanged:
+        result_msg += f"\n♻️ Bez zmian: **{unchanged}** panel(i)."
+    if pruned:
+        result_msg += f"\n🗑️ Usunięto z bazy **{pruned}** nieistniejących paneli."
     if errors:
-        result_msg += f"\n⚠️ Nie udało się odświeżyć **{errors}** paneli (panel mógł zostać usunięty)."
+        result_msg += f"\n⚠️ Nie udało się odświeżyć **{errors}** paneli."
     await interaction.followup.send(result_msg, ephemeral=True)
 
 
 @bot.tree.command(name="info", description="Wyświetla informacje o aktywności użytkownika.")
 async def info(interaction: discord.Interaction, uzytkownik: discord.Member):
     await interaction.response.defer(ephemeral=True)
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.read() as db:
         embed = discord.Embed(
             title=f"📋 Kartoteka: {uzytkownik.display_name}",
             color=uzytkownik.color, timestamp=datetime.now(POLAND_TZ))
@@ -1951,20 +3178,13 @@ async def info(interaction: discord.Interaction, uzytkownik: discord.Member):
             rep = await cursor.fetchone()
         embed.add_field(name="⭐ Reputacja", value=rep[0] if rep else "0", inline=False)
 
-        tables = {
-            "applications": "Podania",
-            "suggestions":  "Propozycje",
-            "bug_reports":  "Błędy",
-            "complaints":   "Skargi",
-            "appeals":      "Odwołania"
-        }
-        for table, name in tables.items():
-            async with db.execute(
-                f"SELECT COUNT(*) FROM {table} WHERE user_id = ?", (str(uzytkownik.id),)) as cursor:
-                count_row = await cursor.fetchone()
-            count = count_row[0]
-            if count > 0:
-                embed.add_field(name=name, value=str(count), inline=True)
+        async with db.execute(
+            "SELECT kind, COUNT(*) FROM submissions WHERE user_id = ? GROUP BY kind",
+            (str(uzytkownik.id),)) as cursor:
+            counts = dict(await cursor.fetchall())
+        for kind, name in SUBMISSION_KINDS.items():
+            if counts.get(kind):
+                embed.add_field(name=name, value=str(counts[kind]), inline=True)
 
         # Aktywne cooldowny
         async with db.execute(
@@ -1992,7 +3212,7 @@ async def info(interaction: discord.Interaction, uzytkownik: discord.Member):
 @bot.tree.command(name="moje_zgloszenia", description="Wyświetla listę Twoich zgłoszeń i ich status.")
 async def moje_zgloszenia(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.read() as db:
         embed = discord.Embed(
             title="📋 Twoje zgłoszenia",
             color=interaction.user.color, timestamp=datetime.now(POLAND_TZ))
@@ -2000,19 +3220,16 @@ async def moje_zgloszenia(interaction: discord.Interaction):
             embed.set_thumbnail(url=LOGO_URL)
         embed.set_footer(text=FOOTER_TEXT)
 
-        tables_map = {
-            "Propozycje": ("suggestions",  "category",         "status"),
-            "Błędy":      ("bug_reports",  "category",         "status"),
-            "Skargi":     ("complaints",   "complaint_type",   "status"),
-            "Odwołania":  ("appeals",      "appeal_type",      "status"),
-            "Podania":    ("applications", "application_type", "status"),
-        }
+        async with db.execute(
+            "SELECT kind, type, status, thread_id FROM submissions WHERE user_id = ?",
+            (str(interaction.user.id),)) as cursor:
+            all_rows = await cursor.fetchall()
+        rows_by_kind = {}
+        for kind, *row in all_rows:
+            rows_by_kind.setdefault(kind, []).append(row)
         content = ""
-        for name, (table, type_col, status_col) in tables_map.items():
-            async with db.execute(
-                f"SELECT {type_col}, {status_col}, thread_id FROM {table} WHERE user_id = ?",
-                (str(interaction.user.id),)) as cursor:
-                rows = await cursor.fetchall()
+        for kind, name in SUBMISSION_KINDS.items():
+            rows = rows_by_kind.get(kind)
             if rows:
                 content += f"**{name}**\n"
                 for row in rows:
@@ -2045,12 +3262,11 @@ async def ankieta(interaction: discord.Interaction, pytanie: str, opcje: str):
     message = await interaction.channel.send(embed=embed)
     view = PollView(options=options_list, message_id=message.id)
     await message.edit(view=view)
-    async with aiosqlite.connect(DB_PATH) as db:
-        initial_votes = json.dumps({str(i): [] for i in range(len(options_list))})
+    async with database.write() as db:
+        # Kolumna votes zostaje tylko dla zgodności - głosy trzymane są w poll_votes
         await db.execute(
-            "INSERT INTO polls (message_id, question, options, votes, author_id) VALUES (?,?,?,?,?)",
-            (message.id, pytanie, json.dumps(options_list), initial_votes, interaction.user.id))
-        await db.commit()
+            "INSERT INTO polls (message_id, question, options, votes, author_id) VALUES (?,?,?,'{}',?)",
+            (message.id, pytanie, json.dumps(options_list), interaction.user.id))
     await interaction.edit_original_response(content="✅ Ankieta została utworzona!")
 
 
@@ -2085,7 +3301,7 @@ async def sprawdz_cooldown(interaction: discord.Interaction, uzytkownik: discord
     if not is_authorized(interaction, RECRUITMENT_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.read() as db:
         async with db.execute(
             "SELECT application_type, rejected_at FROM application_cooldowns WHERE user_id = ?",
             (str(uzytkownik.id),)) as cursor:
@@ -2131,7 +3347,7 @@ async def setup_powiadomienia_sklep(interaction: discord.Interaction, kanal: dis
     if not is_authorized(interaction, SETUP_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    SHOP_CONFIG["channel_id"] = kanal.id
+    await guild_config.update(interaction.guild.id, shop_channel_id=kanal.id)
     await interaction.response.send_message(
         f"✅ Kanał powiadomień o zakupach: {kanal.mention}.", ephemeral=True)
 
@@ -2148,11 +3364,11 @@ async def dodaj_przedmiot(interaction: discord.Interaction, kategoria: str, nazw
         await interaction.response.send_message(
             f"❌ Nieprawidłowa kategoria. Dostępne: {', '.join(SHOP_CATEGORIES)}", ephemeral=True)
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.write() as db:
         await db.execute(
             "INSERT INTO shop_items (name, cost, description, category, role_id, stock) VALUES (?,?,?,?,NULL,NULL)",
             (nazwa, koszt, opis, kategoria))
-        await db.commit()
+    await shop_catalog.refresh(kategoria)
     await interaction.response.send_message(
         f"✅ Dodano `{nazwa}` do kategorii `{kategoria}` za **{koszt}** rep.", ephemeral=True)
 
@@ -2167,11 +3383,11 @@ async def dodaj_specjalna_role(interaction: discord.Interaction, nazwa: str,
     if not is_authorized(interaction, SHOP_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.write() as db:
         await db.execute(
             "INSERT INTO shop_items (name, cost, description, category, role_id, stock) VALUES (?,?,?,?,?,?)",
             (nazwa, koszt, opis, "Specjalne role", rola.id, ilosc))
-        await db.commit()
+    await shop_catalog.refresh("Specjalne role")
     await interaction.response.send_message(
         f"✅ Dodano rolę {rola.mention} jako `{nazwa}` ({ilosc} szt.) za **{koszt}** rep.", ephemeral=True)
 
@@ -2183,7 +3399,7 @@ async def edytuj_przedmiot(interaction: discord.Interaction, id_przedmiotu: int)
     if not is_authorized(interaction, SHOP_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.read() as db:
         async with db.execute(
             "SELECT name FROM shop_items WHERE id = ?", (id_przedmiotu,)) as cursor:
             item = await cursor.fetchone()
@@ -2207,10 +3423,10 @@ async def usun_przedmiot(interaction: discord.Interaction, id_przedmiotu: int):
     if not is_authorized(interaction, SHOP_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.write() as db:
         cursor = await db.execute("DELETE FROM shop_items WHERE id = ?", (id_przedmiotu,))
-        await db.commit()
     if cursor.rowcount > 0:
+        await shop_catalog.refresh(shop_catalog.category_of(id_przedmiotu))
         await interaction.response.send_message(
             f"✅ Usunięto przedmiot ID **{id_przedmiotu}**.", ephemeral=True)
     else:
@@ -2223,49 +3439,144 @@ async def setup_sklep_panel(interaction: discord.Interaction, kanal: discord.Tex
     if not is_authorized(interaction, SETUP_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    embed = await create_shop_embed(SHOP_CATEGORIES[0])
+    embed = shop_catalog.embed(SHOP_CATEGORIES[0])
     view  = ShopView(initial_category=SHOP_CATEGORIES[0])
     await kanal.send(embed=embed, view=view)
     await interaction.response.send_message(
         f"✅ Panel sklepu utworzony na {kanal.mention}.", ephemeral=True)
 
 
-@bot.tree.command(name="ranking", description="Wyświetla ranking użytkowników z największą reputacją.")
-async def ranking(interaction: discord.Interaction):
-    await interaction.response.defer()
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT user_id, points FROM reputation_points ORDER BY points DESC LIMIT 10") as cursor:
-            top_users = await cursor.fetchall()
-    embed = discord.Embed(title="🏆 Ranking Reputacji - Top 10", color=COLORS["main"])
+async def build_ranking_embed(guild: discord.Guild, page: int) -> discord.Embed:
+    embed = discord.Embed(title="🏆 Ranking Reputacji", color=COLORS["main"])
     if LOGO_URL:
         embed.set_thumbnail(url=LOGO_URL)
-    embed.set_footer(text=FOOTER_TEXT)
-    if not top_users:
+    embed.set_footer(text=f"Strona {page}/{leaderboard.page_count} | {FOOTER_TEXT}")
+    entries = leaderboard.page(page)
+    if not entries:
         embed.description = "Ranking jest pusty."
     else:
+        names       = await name_resolver.resolve(guild, [user_id for _, user_id, _ in entries])
         medals      = ["🥇", "🥈", "🥉"]
         description = ""
-        for i, (user_id, points) in enumerate(top_users):
-            user      = interaction.guild.get_member(int(user_id))
-            user_name = user.display_name if user else f"Użytkownik (ID: {user_id})"
-            medal     = medals[i] if i < 3 else f"**{i+1}.**"
+        for position, user_id, points in entries:
+            user_name = names[user_id]
+            medal     = medals[position - 1] if position <= 3 else f"**{position}.**"
             description += f"{medal} {user_name} — `{points} rep.`\n"
         embed.description = description
-    await interaction.followup.send(embed=embed)
+    return embed
+
+
+class RankingView(discord.ui.View):
+    def __init__(self, author_id: int, page: int = 1):
+        super().__init__(timeout=180)
+        self.author_id = author_id
+        self.page      = page
+
+        self.prev_button = discord.ui.Button(emoji="◀️", style=discord.ButtonStyle.secondary)
+        self.next_button = discord.ui.Button(emoji="▶️", style=discord.ButtonStyle.secondary)
+        self.prev_button.callback = self.prev_callback
+        self.next_button.callback = self.next_callback
+        self.add_item(self.prev_button)
+        self.add_item(self.next_button)
+        self._sync_buttons()
+
+    def _sync_buttons(self):
+        self.page = min(self.page, leaderboard.page_count)
+        self.prev_button.disabled = self.page <= 1
+        self.next_button.disabled = self.page >= leaderboard.page_count
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message(
+                "❌ Tylko autor komendy może przewijać ranking. Użyj `/ranking`.", ephemeral=True)
+            return
+        # Nazwy mogą wymagać query_members - potwierdzenie przed budowaniem embedu (limit 3 s)
+        await interaction.response.defer()
+        self.page = page
+        self._sync_buttons()
+        await interaction.edit_original_response(
+            embed=await build_ranking_embed(interaction.guild, self.page), view=self)
+
+    async def prev_callback(self, interaction: discord.Interaction):
+        await self._show(interaction, self.page - 1)
+
+    async def next_callback(self, interaction: discord.Interaction):
+        await self._show(interaction, self.page + 1)
+
+
+@bot.tree.command(name="ranking", description="Wyświetla ranking użytkowników z największą reputacją.")
+@app_commands.describe(strona="Numer strony rankingu")
+async def ranking(interaction: discord.Interaction, strona: app_commands.Range[int, 1] = 1):
+    await interaction.response.defer()
+    view = RankingView(interaction.user.id, page=strona)
+    await interaction.followup.send(embed=await build_ranking_embed(interaction.guild, view.page), view=view)
+
+
+@bot.tree.command(name="moja_pozycja", description="Pokazuje Twoje miejsce w rankingu reputacji.")
+async def moja_pozycja(interaction: discord.Interaction):
+    result = leaderboard.rank(interaction.user.id)
+    if result is None:
+        await interaction.response.send_message(
+            "📭 Nie masz jeszcze reputacji, więc nie ma Cię w rankingu.", ephemeral=True)
+        return
+    position, points = result
+    await interaction.response.send_message(
+        f"🏆 Zajmujesz **{position}.** miejsce na **{len(leaderboard)}** z saldem **{points}** rep.",
+        ephemeral=True)
 
 
 # =========================================================
 # --- PUNKT 5: KOMENDA STATYSTYKI ---
 # =========================================================
-@bot.tree.command(name="statystyki", description="Wyświetla statystyki zgłoszeń i rekrutacji.")
-async def statystyki(interaction: discord.Interaction):
-    if not is_authorized(interaction, GENERAL_ADMIN_ROLES):
-        await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
-        return
-    await interaction.response.defer(ephemeral=True)
+class StatsService:
+    """
+    Statystyki dla /statystyki: jedno zapytanie zbiorcze (oczekujące, rollup 7/30 dni,
+    rekrutacja, cooldowny) trzymane przez TTL sekund; embed budowany od nowa przy każdym
+    wywołaniu, bo komenda dokłada do niego własne pola.
+    Każdy zapis zgłoszenia/decyzji/rekrutacji/cooldownu unieważnia cache.
+    """
+    TTL = 60
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    def __init__(self):
+        self._stats = None
+        self._expires_at = 0.0
+
+    def invalidate(self):
+        self._stats = None
+
+    async def _collect(self) -> dict:
+        async with database.read() as db:
+            async with db.execute('''
+                SELECT 'pending', kind, COUNT(*), NULL FROM submissions
+                WHERE status = 'pending' GROUP BY kind
+                UNION ALL
+                SELECT 'recent', kind, SUM(CASE WHEN day > date('now', '-7 days') THEN submitted ELSE 0 END),
+                       SUM(submitted)
+                FROM submission_daily WHERE day > date('now', '-30 days') GROUP BY kind
+                UNION ALL
+                SELECT 'recruitment', position, is_open, NULL FROM recruitment_status
+                UNION ALL
+                SELECT 'cooldowns', NULL, COUNT(*), NULL FROM application_cooldowns''') as cursor:
+                rows = await cursor.fetchall()
+        stats = {"pending": {}, "recent": {}, "recruitment": [], "cooldowns": 0}
+        for block, key, a, b in rows:
+            if block == "pending":
+                stats["pending"][key] = a
+            elif block == "recent":
+                stats["recent"][key] = (a, b)
+            elif block == "recruitment":
+                stats["recruitment"].append((key, a))
+            else:
+                stats["cooldowns"] = a
+        return stats
+
+    async def embed(self) -> discord.Embed:
+        if self._stats is None or time.monotonic() >= self._expires_at:
+            self._stats = await self._collect()
+            self._expires_at = time.monotonic() + self.TTL
+        return self._render(self._stats)
+
+    def _render(self, stats: dict) -> discord.Embed:
         embed = discord.Embed(
             title="📊 Statystyki serwera",
             color=COLORS["main"],
@@ -2274,20 +3585,9 @@ async def statystyki(interaction: discord.Interaction):
             embed.set_thumbnail(url=LOGO_URL)
 
         # --- Otwarte zgłoszenia ---
-        open_counts = {}
-        open_queries = {
-            "Propozycje":  ("suggestions",  "status = 'pending'"),
-            "Błędy":       ("bug_reports",  "status = 'reported'"),
-            "Skargi":      ("complaints",   "status = 'open'"),
-            "Odwołania":   ("appeals",      "status = 'pending'"),
-            "Podania":     ("applications", "status = 'pending'"),
-        }
         open_lines = []
-        for label, (table, where) in open_queries.items():
-            async with db.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}") as cursor:
-                row = await cursor.fetchone()
-            count = row[0]
-            open_counts[label] = count
+        for kind, label in SUBMISSION_KINDS.items():
+            count = stats["pending"].get(kind, 0)
             emoji = "🟡" if count > 0 else "🟢"
             open_lines.append(f"{emoji} **{label}:** {count} oczekujących")
         embed.add_field(
@@ -2295,32 +3595,17 @@ async def statystyki(interaction: discord.Interaction):
             value="\n".join(open_lines),
             inline=False)
 
-        # --- Statystyki ostatnich 7 dni ---
-        week_ago = (datetime.now(POLAND_TZ) - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
-        week_lines = []
-        for label, (table, _) in open_queries.items():
-            async with db.execute(
-                f"SELECT COUNT(*) FROM {table} WHERE created_at >= ?", (week_ago,)) as cursor:
-                row = await cursor.fetchone()
-            week_lines.append(f"• **{label}:** {row[0]}")
+        # --- Statystyki ostatnich 7 i 30 dni (z dziennego rollupu) ---
+        recent      = stats["recent"]
+        week_lines  = [f"• **{label}:** {recent.get(kind, (0, 0))[0]}" for kind, label in SUBMISSION_KINDS.items()]
+        month_lines = [f"• **{label}:** {recent.get(kind, (0, 0))[1]}" for kind, label in SUBMISSION_KINDS.items()]
         embed.add_field(name="📅 Złożone w ciągu 7 dni", value="\n".join(week_lines), inline=True)
-
-        # --- Statystyki ostatnich 30 dni ---
-        month_ago = (datetime.now(POLAND_TZ) - timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
-        month_lines = []
-        for label, (table, _) in open_queries.items():
-            async with db.execute(
-                f"SELECT COUNT(*) FROM {table} WHERE created_at >= ?", (month_ago,)) as cursor:
-                row = await cursor.fetchone()
-            month_lines.append(f"• **{label}:** {row[0]}")
         embed.add_field(name="📅 Złożone w ciągu 30 dni", value="\n".join(month_lines), inline=True)
 
         # --- Status rekrutacji ---
-        async with db.execute("SELECT position, is_open FROM recruitment_status") as cursor:
-            rec_rows = await cursor.fetchall()
-        if rec_rows:
+        if stats["recruitment"]:
             rec_lines = []
-            for pos, is_open in rec_rows:
+            for pos, is_open in stats["recruitment"]:
                 emoji = "🟢" if is_open else "🔴"
                 rec_lines.append(f"{emoji} {pos}")
             embed.add_field(
@@ -2329,25 +3614,35 @@ async def statystyki(interaction: discord.Interaction):
                 inline=False)
 
         # --- Aktywne cooldowny ---
-        async with db.execute("SELECT COUNT(*) FROM application_cooldowns") as cursor:
-            row = await cursor.fetchone()
-        cd_count = row[0]
-        embed.add_field(name="⏳ Aktywne cooldowny na podania", value=str(cd_count), inline=True)
+        embed.add_field(name="⏳ Aktywne cooldowny na podania", value=str(stats["cooldowns"]), inline=True)
+        return embed
 
-        # --- Top reputacja ---
-        async with db.execute(
-            "SELECT user_id, points FROM reputation_points ORDER BY points DESC LIMIT 3") as cursor:
-            top3 = await cursor.fetchall()
-        if top3:
-            medals   = ["🥇", "🥈", "🥉"]
-            top_lines= []
-            for i, (uid, pts) in enumerate(top3):
-                member = interaction.guild.get_member(int(uid))
-                name   = member.display_name if member else f"ID:{uid}"
-                top_lines.append(f"{medals[i]} {name} — `{pts} rep.`")
-            embed.add_field(name="🏆 Top 3 reputacja", value="\n".join(top_lines), inline=True)
 
-        embed.set_footer(text=FOOTER_TEXT)
+stats_service = StatsService()
+
+
+@bot.tree.command(name="statystyki", description="Wyświetla statystyki zgłoszeń i rekrutacji.")
+async def statystyki(interaction: discord.Interaction):
+    if not is_authorized(interaction, GENERAL_ADMIN_ROLES):
+        await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True)
+    embed = await stats_service.embed()
+
+    # --- Top reputacja ---
+    top3 = [(uid, pts) for _, uid, pts in leaderboard.page(1)[:3]]
+    if top3:
+        names    = await name_resolver.resolve(interaction.guild, [uid for uid, _ in top3])
+        medals   = ["🥇", "🥈", "🥉"]
+        top_lines= [f"{medals[i]} {names[uid]} — `{pts} rep.`" for i, (uid, pts) in enumerate(top3)]
+        embed.add_field(name="🏆 Top 3 reputacja", value="\n".join(top_lines), inline=True)
+
+    embed.add_field(name="♻️ Pominięte edycje wiadomości", value=str(render_cache.saved), inline=True)
+    averages = average_decision_timings()
+    if averages:
+        timing_lines = [f"{stage}: `{seconds * 1000:.0f} ms`" for stage, seconds in averages.items()]
+        embed.add_field(name=f"⏱️ Średni czas decyzji ({len(decision_timings)})", value="\n".join(timing_lines), inline=True)
+    embed.set_footer(text=FOOTER_TEXT)
     await interaction.followup.send(embed=embed)
 
 
@@ -2360,7 +3655,7 @@ async def reputacja_dodaj(interaction: discord.Interaction, uzytkownik: discord.
     if not is_authorized(interaction, REPUTATION_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    new_balance = await update_reputation(uzytkownik.id, ilosc, mode='add')
+    new_balance = await update_reputation(uzytkownik.id, ilosc, mode='add', actor_id=interaction.user.id)
     await interaction.response.send_message(
         f"✅ Dodano **{ilosc}** rep dla {uzytkownik.mention}. Saldo: **{new_balance}** rep.", ephemeral=True)
 
@@ -2371,7 +3666,7 @@ async def reputacja_usun(interaction: discord.Interaction, uzytkownik: discord.M
     if not is_authorized(interaction, REPUTATION_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    new_balance = await update_reputation(uzytkownik.id, -ilosc, mode='add')
+    new_balance = await update_reputation(uzytkownik.id, -ilosc, mode='add', actor_id=interaction.user.id)
     await interaction.response.send_message(
         f"✅ Usunięto **{ilosc}** rep od {uzytkownik.mention}. Saldo: **{new_balance}** rep.", ephemeral=True)
 
@@ -2382,11 +3677,52 @@ async def reputacja_ustaw(interaction: discord.Interaction, uzytkownik: discord.
     if not is_authorized(interaction, REPUTATION_ADMIN_ROLES):
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
-    new_balance = await update_reputation(uzytkownik.id, ilosc, mode='set')
+    new_balance = await update_reputation(uzytkownik.id, ilosc, mode='set', actor_id=interaction.user.id)
     await interaction.response.send_message(
         f"✅ Ustawiono reputację {uzytkownik.mention} na **{new_balance}** rep.", ephemeral=True)
 
 
+@reputation_group.command(name="historia", description="Pokazuje historię zmian reputacji użytkownika.")
+@app_commands.describe(strona="Numer strony (10 wpisów na stronę)",
+                       na_dzien="Pokaż saldo na koniec dnia (DD.MM.RRRR)")
+async def reputacja_historia(interaction: discord.Interaction, uzytkownik: discord.Member,
+                              strona: app_commands.Range[int, 1] = 1, na_dzien: Optional[str] = None):
+    if not is_authorized(interaction, REPUTATION_ADMIN_ROLES):
+        await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
+        return
+    moment = None
+    if na_dzien:
+        try:
+            moment = POLAND_TZ.localize(datetime.strptime(na_dzien, "%d.%m.%Y")) + timedelta(days=1)
+        except ValueError:
+            await interaction.response.send_message("❌ Nieprawidłowy format daty. Użyj DD.MM.RRRR.", ephemeral=True)
+            return
+    await interaction.response.defer(ephemeral=True)
+    entries = await get_reputation_history(uzytkownik.id, limit=10, offset=(strona - 1) * 10)
+
+    embed = discord.Embed(title=f"📜 Historia reputacji - {uzytkownik.display_name}",
+                          color=COLORS["main"])
+    if moment:
+        balance = await get_reputation_balance_at(uzytkownik.id, moment)
+        embed.add_field(name=f"Saldo na koniec {na_dzien}", value=f"**{balance}** rep.", inline=False)
+    if not entries:
+        embed.description = "Brak wpisów na tej stronie."
+    else:
+        sources = {"decision": "Decyzja", "purchase": "Zakup", "manual": "Ręcznie", "migration": "Start"}
+        lines = []
+        for delta, balance, source, reason, actor_id, created_at in entries:
+            ts = int(parse_db_timestamp(created_at).timestamp())
+            line = f"<t:{ts}:d> `{delta:+}` → **{balance}** rep. · {sources.get(source, source)}"
+            if reason:
+                line += f" · {reason}"
+            if actor_id:
+                line += f" · <@{actor_id}>"
+            lines.append(line)
+        embed.description = "\n".join(lines)
+    embed.set_footer(text=f"Strona {strona} | {FOOTER_TEXT}")
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+
 # =========================================================
 # --- KOMENDY REKRUTACJI ---
 # =========================================================
@@ -2398,13 +3734,11 @@ async def rekrutacja_otworz(interaction: discord.Interaction, stanowisko: str):
     if stanowisko not in ALL_RECRUITMENT_TYPES:
         await interaction.response.send_message("❌ Nieprawidłowe stanowisko.", ephemeral=True)
         return
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT OR REPLACE INTO recruitment_status (position, is_open) VALUES (?, 1)", (stanowisko,))
-        await db.commit()
+    await recruitment_status.set(stanowisko, True)
+    schedule_recruitment_refresh(interaction.guild)
     await interaction.response.send_message(
         f"✅ Rekrutacja na **{stanowisko}** jest teraz **otwarta**.\n"
-        f"💡 Użyj `/odswiez_rekrutacje` aby zaktualizować panel.", ephemeral=True)
+        f"🔄 Panele rekrutacji odświeżą się automatycznie.", ephemeral=True)
 
 
 @recruitment_group.command(name="zamknij", description="Zamyka rekrutację na dane stanowisko.")
@@ -2415,13 +3749,11 @@ async def rekrutacja_zamknij(interaction: discord.Interaction, stanowisko: str):
     if stanowisko not in ALL_RECRUITMENT_TYPES:
         await interaction.response.send_message("❌ Nieprawidłowe stanowisko.", ephemeral=True)
         return
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT OR REPLACE INTO recruitment_status (position, is_open) VALUES (?, 0)", (stanowisko,))
-        await db.commit()
+    await recruitment_status.set(stanowisko, False)
+    schedule_recruitment_refresh(interaction.guild)
     await interaction.response.send_message(
         f"✅ Rekrutacja na **{stanowisko}** jest teraz **zamknięta**.\n"
-        f"💡 Użyj `/odswiez_rekrutacje` aby zaktualizować panel.", ephemeral=True)
+        f"🔄 Panele rekrutacji odświeżą się automatycznie.", ephemeral=True)
 
 
 @rekrutacja_otworz.autocomplete('stanowisko')
@@ -2463,7 +3795,7 @@ async def pytanie_dnia(interaction: discord.Interaction, kanal: discord.ForumCha
         await interaction.response.send_message("❌ Nie masz uprawnień.", ephemeral=True)
         return
     await interaction.response.defer(ephemeral=True)
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.write() as db:
         await db.execute(
             "INSERT INTO editorial_counters (type, count) VALUES ('pytanie_dnia', 0) ON CONFLICT(type) DO NOTHING")
         await db.execute("UPDATE editorial_counters SET count = count + 1 WHERE type = 'pytanie_dnia'")
@@ -2471,7 +3803,6 @@ async def pytanie_dnia(interaction: discord.Interaction, kanal: discord.ForumCha
             "SELECT count FROM editorial_counters WHERE type = 'pytanie_dnia'") as cursor:
             row = await cursor.fetchone()
         new_count = row[0]
-        await db.commit()
     title = f"Pytanie dnia #{new_count}"
     embed = discord.Embed(
         title=f"❓ {title}", description=pytanie,
@@ -2518,48 +3849,138 @@ async def qa(interaction: discord.Interaction, kanal: discord.ForumChannel, tytu
 # =========================================================
 # --- ZADANIA W TLE ---
 # =========================================================
-@tasks.loop(hours=1)
-async def check_for_old_posts():
-    if not REMINDER_CONFIG["enabled"]:
-        return
-    async with aiosqlite.connect(DB_PATH) as db:
-        delay          = timedelta(days=REMINDER_CONFIG["delay_days"])
-        time_threshold = datetime.now(POLAND_TZ) - delay
-        tables_to_check = {
-            "suggestions":  "category",
-            "bug_reports":  "category",
-            "complaints":   "complaint_type",
-            "appeals":      "appeal_type",
-            "applications": "application_type",
-        }
-        for table, type_col in tables_to_check.items():
+class ReminderScheduler:
+    """
+    Przypomnienia o nierozpatrzonych zgłoszeniach sterowane terminami.
+    Kopiec (remind_at, id) w pamięci, odbudowywany przy starcie z indeksu
+    idx_submissions_remind - pętla śpi dokładnie do najbliższego terminu.
+    """
+    RETRY_DELAY = 3600
+
+    def __init__(self):
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        self._wakeup.set()
+
+    def schedule(self, remind_at: datetime, submission_id: int, guild_id, thread_id, post_type: str):
+        heapq.heappush(self._heap, (remind_at.timestamp(), submission_id, guild_id, thread_id, post_type))
+        self.wake()
+
+    async def load(self):
+        async with database.read() as db:
             async with db.execute(
-                f"SELECT thread_id, {type_col} FROM {table} "
-                f"WHERE status NOT LIKE '%odrzucon%' AND status NOT LIKE '%przyjęt%' "
-                f"AND status NOT LIKE '%naprawion%' AND reminder_sent = 0 AND created_at < ?",
-                (time_threshold.strftime('%Y-%m-%d %H:%M:%S.%f'),)) as cursor:
-                old_posts = await cursor.fetchall()
-
-            for thread_id, post_type in old_posts:
-                for guild in bot.guilds:
+                "SELECT remind_at, id, guild_id, thread_id, type FROM submissions "
+                "WHERE status IN ('pending', 'in_progress') AND reminder_sent = 0 "
+                "AND remind_at IS NOT NULL") as cursor:
+                rows = await cursor.fetchall()
+        self._heap = [(parse_db_timestamp(remind_at).timestamp(), *entry) for remind_at, *entry in rows]
+        heapq.heapify(self._heap)
+        self.wake()
+
+    async def reschedule(self, guild_id: int, delay_days: int):
+        """Przelicza terminy otwartych zgłoszeń serwera po zmianie opóźnienia."""
+        async with database.write() as db:
+            await db.execute(
+                "UPDATE submissions SET remind_at = datetime(created_at, ?) "
+                "WHERE guild_id = ? AND status IN ('pending', 'in_progress') AND reminder_sent = 0",
+                (f"+{delay_days} days", str(guild_id)))
+        await self.load()
+
+    async def _run(self):
+        await bot.wait_until_ready()
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self._heap:
+                timeout = self._heap[0][0] - time.time()
+                if timeout <= 0:
                     try:
-                        thread = await guild.fetch_channel(int(thread_id))
-                        if not thread.locked:
-                            await send_notification(guild, post_type, thread.jump_url, is_reminder=True)
-                        await db.execute(
-                            f"UPDATE {table} SET reminder_sent = 1 WHERE thread_id = ?", (thread_id,))
-                        await db.commit()
-                    except (discord.NotFound, discord.Forbidden, discord.HTTPException):
-                        continue
+                        await self._fire_due()
+                    except Exception as e:
+                        print(f"Błąd podczas wysyłania przypomnień: {e}")
+                        traceback.print_exc()
+                    continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire_due(self):
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+
+        # Zgłoszenia rozpatrzone od czasu zaplanowania odpadają tutaj
+        placeholders = ",".join("?" * len(due))
+        async with database.read() as db:
+            async with db.execute(
+                f"SELECT id FROM submissions WHERE id IN ({placeholders}) "
+                f"AND status IN ('pending', 'in_progress') AND reminder_sent = 0",
+                [entry[1] for entry in due]) as cursor:
+                still_open = {row[0] for row in await cursor.fetchall()}
+
+        # Wpisy serwerów z wyłączonymi przypomnieniami wypadają z kopca
+        # i wracają przez load() przy ponownym włączeniu
+        done = []
+        for _, submission_id, guild_id, thread_id, post_type in due:
+            if submission_id not in still_open:
+                continue
+            if guild_id and not guild_config.get(guild_id)["reminders_enabled"]:
+                continue
+            try:
+                thread = bot.get_channel(int(thread_id)) or await bot.fetch_channel(int(thread_id))
+                if not guild_config.get(thread.guild.id)["reminders_enabled"]:
+                    continue
+                if not getattr(thread, "locked", False):
+                    await send_notification(thread.guild, post_type, thread.jump_url, is_reminder=True)
+            except (discord.NotFound, discord.Forbidden):
+                pass
+            except discord.HTTPException:
+                heapq.heappush(self._heap, (now + self.RETRY_DELAY, submission_id, guild_id, thread_id, post_type))
+                continue
+            done.append((submission_id,))
+
+        if done:
+            async with database.write() as db:
+                await db.executemany("UPDATE submissions SET reminder_sent = 1 WHERE id = ?", done)
+
+
+reminder_scheduler = ReminderScheduler()
 
 
 # =========================================================
 # --- EVENTY BOTA ---
 # =========================================================
+async def sync_command_tree():
+    """Synchronizuje komendy tylko gdy zmienił się ich payload (hash trzymany w bot_state)."""
+    payload = sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands()),
+                     key=lambda command: command["name"])
+    tree_hash = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    if await get_bot_state("command_tree_hash") == tree_hash:
+        print("Komendy bez zmian - pomijam synchronizację.")
+        return
+    synced = await bot.tree.sync()
+    await set_bot_state("command_tree_hash", tree_hash)
+    print(f"Zsynchronizowano {len(synced)} komend.")
+
+
 @bot.event
-async def on_ready():
-    print(f'Zalogowano jako {bot.user}!')
+async def setup_hook():
+    # Jednorazowy start - on_ready odpala się przy każdym ponownym połączeniu z gatewayem
     await init_database()
+    await guild_config.load()
+    await shop_catalog.load()
+    await leaderboard.load()
+    await name_resolver.load()
+    await recruitment_status.load()
 
     bot.add_view(ForumSelectionView("proposals_bugs"))
     bot.add_view(ForumSelectionView("complaints_appeals"))
@@ -2573,13 +3994,7 @@ async def on_ready():
     for post_type in post_types:
         bot.add_view(ManagementView(post_type, author_id=0))
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT message_id, options FROM polls") as cursor:
-            rows = await cursor.fetchall()
-        for row in rows:
-            message_id, options_json = row
-            options = json.loads(options_json)
-            bot.add_view(PollView(options, message_id))
+    bot.add_dynamic_items(PollButton)
 
     bot.tree.add_command(reputation_group)
     bot.tree.add_command(recruitment_group)
@@ -2587,15 +4002,61 @@ async def on_ready():
     bot.tree.add_command(redakcja_group)
     bot.tree.add_command(podania_group)
 
-    check_for_old_posts.start()
+    await reminder_scheduler.load()
+    reminder_scheduler.start()
+    action_log.start()
 
     try:
-        synced = await bot.tree.sync()
-        print(f"Zsynchronizowano {len(synced)} komend.")
+        await sync_command_tree()
     except Exception as e:
         print(f"Błąd synchronizacji komend: {e}")
 
 
+@bot.event
+async def on_ready():
+    print(f'Zalogowano jako {bot.user}!')
+
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    if isinstance(after, discord.ForumChannel):
+        if [(t.id, t.name) for t in before.available_tags] != [(t.id, t.name) for t in after.available_tags]:
+            tag_index.rebuild(after)
+
+
+@bot.event
+async def on_guild_role_create(role: discord.Role):
+    role_registry.invalidate(role.guild.id)
+
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    if before.name != after.name:
+        role_registry.invalidate(after.guild.id)
+
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    role_registry.invalidate(role.guild.id)
+
+
+@bot.event
+async def on_member_join(member: discord.Member):
+    await name_resolver.remember([member])
+
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if before.display_name != after.display_name:
+        await name_resolver.remember([after])
+
+
+@bot.event
+async def on_member_remove(member: discord.Member):
+    # Ostatnia znana nazwa zostaje w snapshocie - ranking dalej pokaże osobę, która wyszła
+    await name_resolver.remember([member])
+
+
 # =========================================================
 # --- URUCHOMIENIE BOTA ---
 # =========================================================
@@ -2605,4 +4066,20 @@ if not TOKEN:
     print("!!! BRAK TOKENA! Ustaw zmienną DISCORD_BOT_TOKEN !!!")
     print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
 else:
-    bot.run(TOKEN)
+    async def main():
+        try:
+            async with bot:
+                try:
+                    await bot.start(TOKEN)
+                finally:
+                    # Zaległe logi wysyłane zanim bot zamknie sesję HTTP
+                    await action_log.stop()
+        finally:
+            # Baza zamykana dopiero po zamknięciu bota - handlery i zadania w tle mogą z niej jeszcze korzystać
+            await database.close()
+
+    discord.utils.setup_logging()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass